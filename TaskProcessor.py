@@ -4,15 +4,25 @@ from dotenv import load_dotenv
 from litequeue import LiteQueue
 import concurrent.futures
 from utils.NotionClient import NotionClient
-from utils.ThemeExtractor import ThemeExtractor
-from utils.Summarizer import TextSummarizer
+from utils.NotionReplica import NotionReplica
+from utils.BlockCache import BlockCache
+from utils.Deduplicator import Deduplicator
+from utils.Profiler import TaskProfiler
+from utils.TokenBudget import TokenBudget
 import json
 import logging
-import requests
-from bs4 import BeautifulSoup
+from utils.CpuPool import CpuPool
+from utils.Parsers import html_to_text_bytes
 
 class Processor:
-    def __init__(self, queue: LiteQueue):
+    def __init__(self, queue: LiteQueue, task=None):
+        """
+        Initialize Processor.
+
+        Args:
+            queue: Task queue
+            task: Optional task already popped from the queue, otherwise the next one is popped
+        """
         load_dotenv()
         self.NOTION_TOKEN = os.getenv('NOTION_TOKEN')
         if not self.NOTION_TOKEN:
@@ -21,25 +31,33 @@ class Processor:
         self.queue = queue
         self.notion = None
         self.task_id = None
+        self.deduplicator = None
+        self.signature = []
         page_url = None
 
         logging.info("Initializing TaskProcessor...")
         
-        if ((self.queue.empty()) or (self.queue.qsize() < 1)):
+        if task is None and ((self.queue.empty()) or (self.queue.qsize() < 1)):
             logging.info("Queue is empty")
             return
             
         try:
-            logging.info("Popping a task from the queue...")
-            task = queue.pop()
             if task is None:
-                raise ValueError("No tasks available in queue")
+                logging.info("Popping a task from the queue...")
+                task = queue.pop()
+            if task is None:
+                # Another consumer process took the last task
+                logging.info("No tasks available in queue")
+                return
             
             task_data = json.loads(task.data)
             logging.debug(f"Task data: {task_data}")
             self.task_id = task.message_id
+            self.task_data = task.data
             self.page_id = task_data["id"]
-            self.notion = NotionClient.new(self.NOTION_TOKEN, task_data["database_id"])
+            self.notion_url = task_data.get("url")
+            self.notion = NotionClient.new(self.NOTION_TOKEN, task_data["database_id"], replica=NotionReplica(),
+                                           block_cache=BlockCache())
             logging.info(f"Fetching content for page ID: {self.page_id}")
             self.content = self.notion.get_page(self.page_id)
 
@@ -67,6 +85,7 @@ class Processor:
 
     def process_theme(self):
         logging.info("Starting theme processing...")
+        from utils.ThemeExtractor import ThemeExtractor
         start_time = time.time()
         theme_extractor = ThemeExtractor()
         theme_result = theme_extractor.extract_themes(self.content)
@@ -79,6 +98,7 @@ class Processor:
 
     def process_summary(self):
         logging.info("Starting summary processing...")
+        from utils.Summarizer import TextSummarizer
         start_time = time.time()
         summarizer = TextSummarizer()
         summary_result = summarizer.summarize(self.content)
@@ -91,6 +111,7 @@ class Processor:
 
     def scrape_content_from_url(self, url):
         """Scrapes text content from a given URL using BeautifulSoup."""
+        import requests
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
@@ -101,8 +122,8 @@ class Processor:
             try:
                 response = requests.get(url, headers=headers)
                 response.raise_for_status()
-                soup = BeautifulSoup(response.content, 'html.parser')
-                text_content = soup.get_text(separator=' ', strip=True)
+                # HTML parsing runs in the process pool when one is configured
+                text_content = CpuPool.run(html_to_text_bytes, response.content).decode("utf-8")
                 return text_content
             except requests.exceptions.RequestException as e:
                 logging.error(f"Attempt {attempt + 1}/{max_retries} failed: {e}")
@@ -115,21 +136,85 @@ class Processor:
                 logging.error(f"An unexpected error occurred during scraping from {url}: {e}")
                 return ""
 
+    def find_duplicate(self):
+        """Fingerprint the fetched content and look for an already processed near-duplicate."""
+        try:
+            self.deduplicator = Deduplicator()
+            self.signature = self.deduplicator.signature(self.content)
+            return self.deduplicator.find_duplicate(self.signature, exclude=self.page_id)
+        except Exception as e:
+            logging.warning(f"Near-duplicate lookup failed for page ID {self.page_id}: {e}")
+            self.deduplicator = None
+            return None
+
+    def copy_duplicate(self, duplicate):
+        logging.info(f"Page {self.page_id} is a near-duplicate of {duplicate['page_id']} "
+                     f"(similarity {duplicate['similarity']:.2f}), copying existing results...")
+        if duplicate["theme"]:
+            self.notion.page_add_description(self.page_id, duplicate["theme"], duplicate["keywords"])
+        if duplicate["summary"]:
+            self.notion.page_add_summary(self.page_id, duplicate["summary"][:2000])
+        self.deduplicator.add(self.page_id, self.signature, duplicate["theme"], duplicate["keywords"], duplicate["summary"])
+
+    def index_article(self, theme, summary):
+        """Embed the article theme and summary into the local vector index for related-article lookup."""
+        text = "\n".join(part for part in (theme, summary) if part)
+        if not text:
+            return
+        try:
+            # numpy and the embedder are only loaded once an article is indexed
+            from utils.VectorIndex import VectorIndex
+            VectorIndex().add([{"id": self.page_id, "url": self.notion_url, "text": text}])
+        except Exception as e:
+            logging.warning(f"Failed to index page ID {self.page_id} for related-article lookup: {e}")
+
     def run(self):
         if self.notion is None:
             logging.error("Processor not properly initialized")
             raise RuntimeError("Processor not properly initialized")
         try:
+            duplicate = self.find_duplicate()
+            if duplicate:
+                self.copy_duplicate(duplicate)
+                self.index_article(duplicate["theme"], duplicate["summary"])
+                if self.task_id is not None:
+                    logging.info(f"Marking task {self.task_id} as done...")
+                    self.queue.done(self.task_id)
+                return
+
+            budget = TokenBudget()
+            estimate = budget.estimate(self.content)
+            if not budget.can_ever_fit(estimate):
+                logging.error(f"Page ID {self.page_id} needs ~{estimate} tokens, more than the whole daily budget "
+                              f"of {budget.daily_budget}, marking task {self.task_id} as failed")
+                self.queue.mark_failed(self.task_id)
+                return
+            reason = budget.defer_reason(estimate)
+            if reason:
+                logging.info(f"Deferring page ID {self.page_id}: {reason}")
+                budget.defer(self.queue, self.task_id, self.task_data, estimate)
+                return
+            # Wait for room under the tokens-per-minute limit instead of hitting 429s mid-task
+            reservation = budget.reserve(estimate)
+
             logging.info("Starting concurrent processing of theme and summary...")
-            # Create thread pool executor
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                # Submit both tasks to run in parallel
-                theme_future = executor.submit(self.process_theme)
-                summary_future = executor.submit(self.process_summary)
-
-                # Get results from both tasks
-                theme_result = theme_future.result()
-                summary_result = summary_future.result()
+            try:
+                if TaskProfiler.single_threaded():
+                    # Profiled task on Python < 3.12: stay in the profiled thread
+                    theme_result = self.process_theme()
+                    summary_result = self.process_summary()
+                else:
+                    # Create thread pool executor
+                    with concurrent.futures.ThreadPoolExecutor() as executor:
+                        # Submit both tasks to run in parallel
+                        theme_future = executor.submit(self.process_theme)
+                        summary_future = executor.submit(self.process_summary)
+
+                        # Get results from both tasks
+                        theme_result = theme_future.result()
+                        summary_result = summary_future.result()
+            finally:
+                budget.release(reservation)
             logging.info("Concurrent processing completed.")
             # Update the Notion page with results
             if theme_result:
@@ -145,7 +230,18 @@ class Processor:
                 logging.info(f"Notion page {self.page_id} updated with summary.")
             else:
                 logging.warning(f"Notion page {self.page_id} not update with summary, since not result")
-            
+
+            # Only complete results are reused, a partial entry would short-circuit a page without its summary
+            if self.deduplicator is not None and theme_result and summary_result:
+                self.deduplicator.add(
+                    self.page_id,
+                    self.signature,
+                    theme_result["theme"],
+                    theme_result["keywords"],
+                    summary_result[:2000]
+                )
+            self.index_article(theme_result["theme"] if theme_result else None, summary_result)
+
             if self.task_id is not None:
                 logging.info(f"Marking task {self.task_id} as done...")
                 self.queue.done(self.task_id)
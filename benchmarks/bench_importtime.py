@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Startup cost of the entry points, measured with `python -X importtime`.
+
+    python benchmarks/bench_importtime.py                       # main, TaskProcessor, QuickReader
+    python benchmarks/bench_importtime.py --save baseline.json  # record a baseline
+    python benchmarks/bench_importtime.py --baseline baseline.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["main", "TaskProcessor", "utils.QuickReader"]
+
+
+def import_profile(module: str) -> tuple:
+    """Cumulative import time of module and of each of its direct imports, in microseconds."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed: {completed.stderr.strip().splitlines()[-1]}")
+    total, dependencies, pending = 0, {}, {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        # Children are reported before their parent; keep the pending direct imports of each top-level module
+        if depth == 1:
+            pending[name.strip()] = int(cumulative)
+        elif depth == 0:
+            if name.strip() == module:
+                total, dependencies = int(cumulative), dict(pending)
+            pending = {}
+    return total, dependencies
+
+
+def measure(module: str, runs: int) -> dict:
+    profiles = [import_profile(module) for _ in range(runs)]
+    total, dependencies = profiles[-1]
+    heaviest = sorted(dependencies.items(), key=lambda item: item[1], reverse=True)
+    return {
+        "median_ms": statistics.median(total for total, _ in profiles) / 1000,
+        "heaviest": [(name, us / 1000) for name, us in heaviest[:8]],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=MODULES, help="modules to import")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per module")
+    parser.add_argument("--save", help="write the results to a JSON file")
+    parser.add_argument("--baseline", help="compare against a JSON file written by --save")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    for module in args.modules:
+        try:
+            results[module] = result = measure(module, args.runs)
+        except RuntimeError as e:
+            print(e)
+            continue
+        line = f"{module:<20} {result['median_ms']:8.1f} ms"
+        if module in baseline:
+            line += f"  baseline {baseline[module]['median_ms']:.1f} ms ({result['median_ms'] / baseline[module]['median_ms']:.2f}x)"
+        print(line)
+        for name, ms in result["heaviest"]:
+            print(f"    {ms:8.1f} ms  {name}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
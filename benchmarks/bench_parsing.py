@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Articles/minute with and without the CPU pool.
+
+Each simulated task sleeps for the network fetch, then parses one page, the way
+Processor.scrape_content_from_url does, from several threads at once.
+
+    python benchmarks/bench_parsing.py --corpus saved_pages/ --threads 8 --workers 4
+"""
+
+import os
+import sys
+import time
+import glob
+import random
+import argparse
+import concurrent.futures
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.CpuPool import CpuPool
+from utils.Parsers import html_to_text_bytes
+
+
+def synthetic_pages(count: int, size: int) -> list:
+    generator = random.Random(0)
+    words = ["notion", "queue", "summary", "article", "theme", "kindle", "parser", "process", "thread", "latency"]
+    pages = []
+    for _ in range(count):
+        parts = ["<html><body>"]
+        total = 0
+        while total < size:
+            paragraph = " ".join(generator.choice(words) for _ in range(60))
+            chunk = f"<div class='c'><p>{paragraph} <a href='#'>link</a> <span>{paragraph[:80]}</span></p></div>"
+            parts.append(chunk)
+            total += len(chunk)
+        parts.append("</body></html>")
+        pages.append("".join(parts).encode("utf-8"))
+    return pages
+
+
+def load_corpus(path: str) -> list:
+    pages = []
+    for name in sorted(glob.glob(os.path.join(path, "**", "*.htm*"), recursive=True)):
+        with open(name, "rb") as f:
+            pages.append(f.read())
+    return pages
+
+
+def run(pages: list, threads: int, io_seconds: float) -> float:
+    def task(page):
+        time.sleep(io_seconds)
+        return len(CpuPool.run(html_to_text_bytes, page))
+
+    started = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(task, pages))
+    return len(pages) / (time.perf_counter() - started) * 60
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", help="directory of saved .html pages (synthetic pages when omitted)")
+    parser.add_argument("--pages", type=int, default=64, help="number of synthetic pages")
+    parser.add_argument("--size", type=int, default=1_000_000, help="bytes per synthetic page")
+    parser.add_argument("--threads", type=int, default=8, help="concurrent tasks")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="CPU pool processes")
+    parser.add_argument("--io", type=float, default=0.2, help="simulated fetch latency per article, in seconds")
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus) if args.corpus else synthetic_pages(args.pages, args.size)
+    if not pages:
+        parser.error(f"no .html pages found in {args.corpus}")
+    print(f"{len(pages)} pages, {sum(map(len, pages)) / len(pages) / 1024:.0f} KiB average, "
+          f"{args.threads} threads, {args.io}s simulated fetch")
+
+    os.environ["CPU_WORKERS"] = "0"
+    inline = run(pages, args.threads, args.io)
+    print(f"inline:           {inline:8.1f} articles/minute")
+
+    os.environ["CPU_WORKERS"] = str(args.workers)
+    # Warm every pool process up so start-up isn't billed to the first pages
+    warm_up = b"<p>warm-up</p>" * CpuPool.min_bytes()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.workers) as executor:
+        list(executor.map(lambda _: CpuPool.run(html_to_text_bytes, warm_up), range(args.workers * 2)))
+    pooled = run(pages, args.threads, args.io)
+    CpuPool.shutdown()
+    print(f"pool ({args.workers} procs):  {pooled:8.1f} articles/minute  ({pooled / inline:.2f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,16 @@
 #!/usr/bin/env python3
 
 import os
+import sys
+import json
 import time
+import argparse
 import schedule
 from datetime import datetime
 from dotenv import load_dotenv
-from litequeue import LiteQueue
-from utils.NotionClient import NotionClient
-import TaskProcessor
+from utils.Workers import open_queue, retry_task, TaskHeartbeat, LeaderLease, Supervisor
+from utils.Profiler import TaskProfiler
+from utils.TokenBudget import TokenBudget
 import logging  # Import the logging module
 
 # Load environment variables
@@ -16,7 +19,7 @@ load_dotenv()
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,  # Set the logging level (e.g., DEBUG, INFO, WARNING, ERROR, CRITICAL)
-    format="%(asctime)s [%(levelname)s] %(message)s",  # Define the log message format
+    format="%(asctime)s [%(levelname)s] %(processName)s %(message)s",  # Define the log message format
     handlers=[
         logging.FileHandler("app.log"),  # Log to a file named 'app.log'
         logging.StreamHandler()  # Log to the console as well
@@ -28,12 +31,20 @@ SCHEDULE_INTERVAL = os.getenv('SCHEDULE_INTERVAL', '10min')  # Default to 10min
 LITEQUEUE_DB = os.getenv('LITEQUEUE_DB', 'queue.sqlite3')  # Default to queue if not set
 NOTION_TOKEN = os.getenv('NOTION_TOKEN')
 NOTION_DATABASE_ID = os.getenv('NOTION_DATABASE_ID')
+WORKERS = int(os.getenv('WORKERS', '0'))  # 0 = single process
+CONSUMER_IDLE_SECONDS = float(os.getenv('CONSUMER_IDLE_SECONDS', '5'))
+TASK_LOCK_TIMEOUT = int(os.getenv('TASK_LOCK_TIMEOUT', '1800'))  # Locked tasks older than this without a heartbeat are requeued
 
-QUEUE = LiteQueue(LITEQUEUE_DB)
+# Opened on first use, so every worker process gets its own connection
+QUEUE = None
 
-def task():
-    """Main task to be executed on schedule"""
-    logging.info(f"Task started at {datetime.now()}")
+def get_queue():
+    global QUEUE
+    if QUEUE is None:
+        QUEUE = open_queue(LITEQUEUE_DB)
+    return QUEUE
+
+def check_config():
     if not NOTION_TOKEN:
         logging.error("Error: NOTION_TOKEN environment variable is not set")
         logging.error("Please set NOTION_TOKEN in your .env file")
@@ -43,34 +54,99 @@ def task():
         logging.error("Please set NOTION_DATABASE_ID in your .env file")
         exit(1)
 
-    QUEUE.prune(False) # Delete `DONE` messages
-    notion = NotionClient.new(NOTION_TOKEN, NOTION_DATABASE_ID, QUEUE)
+def poll():
+    """Enqueue new Notion pages and give tasks left locked by crashed workers another chance"""
+    from utils.NotionClient import NotionClient
+    from utils.NotionReplica import NotionReplica
+    queue = get_queue()
+    queue.prune(False) # Delete `DONE` messages
+    alive = TaskHeartbeat.alive(LITEQUEUE_DB)
+    for message in list(queue.list_locked(TASK_LOCK_TIMEOUT)):
+        # Slow tasks keep beating; only tasks whose worker died are requeued
+        if message.message_id in alive:
+            continue
+        retry_task(queue, message.message_id, message.data, f"no heartbeat, locked for over {TASK_LOCK_TIMEOUT}s")
+    TokenBudget().release_deferred(queue)
+    notion = NotionClient.new(NOTION_TOKEN, NOTION_DATABASE_ID, queue, NotionReplica())
+    logging.info("Processing Notion database queue")
+    notion.database_queue()
+
+def process_next():
+    """Pop and process one task, returns False when there was nothing to do"""
+    # Imported here so --help, the supervisor and the poller don't load the processing stack
+    import TaskProcessor
+    if not TokenBudget().has_capacity():
+        logging.debug("LLM token budget reached, leaving the queue for later")
+        return False
+    queue = get_queue()
+    message = queue.pop()
+    if message is None:
+        return False
+    with TaskHeartbeat(LITEQUEUE_DB, message.message_id), TaskProfiler.task() as profile:
+        try:
+            if profile is not None:
+                # Tagged before the Processor exists so slow or failing fetches and scrapes are kept too
+                profile.tags["page_id"] = json.loads(message.data)["id"]
+            processor = TaskProcessor.Processor(queue, message)
+            if profile is not None:
+                profile.tags["content_length"] = len(getattr(processor, "content", None) or "")
+            if processor.notion is not None:
+                processor.run()
+        except Exception as e:
+            retry_task(queue, message.message_id, message.data, e)
+            raise
+    return True
+
+def task():
+    """Main task to be executed on schedule"""
+    logging.info(f"Task started at {datetime.now()}")
+    check_config()
     try:
-        logging.info("Processing Notion database queue")
-        notion.database_queue()
-        if not QUEUE.empty():
+        poll()
+        if not get_queue().empty():
             logging.info("Queue is not empty, running processor")
-            processor = TaskProcessor.Processor(QUEUE)
-            processor.run()
+            process_next()
         logging.info("Task finished")
     except Exception as e:
         logging.exception(f"An error occurred during task execution: {e}")
         return None
 
+def run_once():
+    """Run a single poll/drain cycle and exit, for cron jobs and systemd timers"""
+    check_config()
+    failed = False
+    try:
+        poll()
+    except Exception as e:
+        logging.exception(f"An error occurred while polling Notion: {e}")
+        failed = True
+    processed = 0
+    while True:
+        try:
+            if not process_next():
+                break
+            processed += 1
+        except Exception as e:
+            # The task was requeued or marked failed, move on to the next one
+            logging.exception(f"An error occurred during task execution: {e}")
+            failed = True
+    logging.info(f"Single run finished, {processed} tasks processed")
+    return 1 if failed else 0
+
 SCHEDULE_CONFIGS = {
-    '2min': lambda: schedule.every(2).minutes.do(task),
-    '5min': lambda: schedule.every(5).minutes.do(task),
-    '10min': lambda: schedule.every(10).minutes.do(task),
-    '25min': lambda: schedule.every(25).minutes.do(task),
-    'hourly': lambda: schedule.every().hour.do(task),
-    '2hours': lambda: schedule.every(2).hours.do(task),
-    'daily': lambda: schedule.every().day.at("00:00").do(task)
+    '2min': lambda job: schedule.every(2).minutes.do(job),
+    '5min': lambda job: schedule.every(5).minutes.do(job),
+    '10min': lambda job: schedule.every(10).minutes.do(job),
+    '25min': lambda job: schedule.every(25).minutes.do(job),
+    'hourly': lambda job: schedule.every().hour.do(job),
+    '2hours': lambda job: schedule.every(2).hours.do(job),
+    'daily': lambda job: schedule.every().day.at("00:00").do(job)
 }
 
-def setup_schedule():
+def setup_schedule(job=task):
     """Configure the schedule based on environment variable"""
     try:
-        SCHEDULE_CONFIGS[SCHEDULE_INTERVAL]()
+        SCHEDULE_CONFIGS[SCHEDULE_INTERVAL](job)
         logging.info(f"Schedule set to: {SCHEDULE_INTERVAL}")
     except KeyError:
         logging.error(f"Invalid schedule interval: {SCHEDULE_INTERVAL}")
@@ -78,6 +154,7 @@ def setup_schedule():
 
 def run_scheduler():
     """Run the scheduler as a daemon"""
+    TaskProfiler.install_signal_handler()
     setup_schedule()
     logging.info(f"Scheduler started with {SCHEDULE_INTERVAL} interval")
 
@@ -85,9 +162,66 @@ def run_scheduler():
         schedule.run_pending()
         time.sleep(1)
 
+def run_poller():
+    """Worker process: polls Notion on schedule while it holds the leader lease"""
+    check_config()
+    lease = LeaderLease(LITEQUEUE_DB)
+    lease.start()
+
+    def leader_poll():
+        if not lease.is_leader:
+            logging.info("Not the leader, skipping Notion poll")
+            return
+        try:
+            poll()
+        except Exception as e:
+            logging.exception(f"An error occurred while polling Notion: {e}")
+
+    setup_schedule(leader_poll)
+    try:
+        while True:
+            schedule.run_pending()
+            time.sleep(1)
+    finally:
+        lease.stop()
+
+def run_consumer():
+    """Worker process: drains the queue, sleeping while it is empty"""
+    check_config()
+    TaskProfiler.install_signal_handler()
+    while True:
+        try:
+            if not process_next():
+                time.sleep(CONSUMER_IDLE_SECONDS)
+        except Exception as e:
+            logging.exception(f"An error occurred during task execution: {e}")
+
+def run_workers(workers):
+    """Run one poller and N consumers under a supervisor that restarts crashed processes"""
+    check_config()
+    targets = {"poller": run_poller}
+    for index in range(workers):
+        targets[f"consumer-{index + 1}"] = run_consumer
+    logging.info(f"Starting {workers} consumer processes")
+    Supervisor(targets).run()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Summarize Notion articles with LLMs")
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="run one elected poller and N consumer processes (default: WORKERS or single process)")
+    parser.add_argument("--once", action="store_true",
+                        help="poll Notion, drain the queue and exit instead of running the scheduler")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
+    if args.once:
+        sys.exit(run_once())
     try:
-        run_scheduler()
+        if args.workers > 0:
+            run_workers(args.workers)
+        else:
+            run_scheduler()
     except KeyboardInterrupt:
         logging.info("\nScheduler stopped by user")
     except Exception as e:
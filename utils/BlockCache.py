@@ -0,0 +1,96 @@
+import os
+import json
+import sqlite3
+from dotenv import load_dotenv
+
+# BlockCache persists raw Notion blocks keyed by block id and last_edited_time, so
+# re-fetching a page only downloads its top-level listing and the subtrees that
+# changed, and an unedited page is served without listing its blocks at all.
+
+class BlockCache:
+    def __init__(self, db_path: str = None):
+        """
+        Initialize BlockCache.
+
+        Args:
+            db_path: Path of the SQLite cache file (NOTION_BLOCK_CACHE_DB)
+        """
+        load_dotenv()
+        self.db_path = db_path or os.getenv('NOTION_BLOCK_CACHE_DB', 'blocks.sqlite3')
+        self.conn = sqlite3.connect(self.db_path, timeout=float(os.getenv('SQLITE_BUSY_TIMEOUT', '30')))
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (
+                page_id TEXT PRIMARY KEY,
+                last_edited_time TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS blocks (
+                block_id TEXT PRIMARY KEY,
+                parent_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                last_edited_time TEXT,
+                has_children INTEGER NOT NULL DEFAULT 0,
+                children_cached INTEGER NOT NULL DEFAULT 0,
+                raw TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_blocks_parent ON blocks (parent_id, position);
+        """)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def _descendants(self, parent_id: str) -> list:
+        """Cached blocks under a parent, flattened in document order."""
+        result = []
+        rows = self.conn.execute(
+            "SELECT block_id, has_children, raw FROM blocks WHERE parent_id = ? ORDER BY position",
+            (parent_id,)
+        ).fetchall()
+        for block_id, has_children, raw in rows:
+            result.append(json.loads(raw))
+            if has_children:
+                result.extend(self._descendants(block_id))
+        return result
+
+    def get_page(self, page_id: str, last_edited_time: str):
+        """Return the page's flattened blocks if it is unchanged since it was cached, else None."""
+        row = self.conn.execute("SELECT last_edited_time FROM pages WHERE page_id = ?", (page_id,)).fetchone()
+        if row is None or last_edited_time is None or row[0] != last_edited_time:
+            return None
+        return self._descendants(page_id)
+
+    def get_subtree(self, block_id: str, last_edited_time: str):
+        """Return a block's flattened descendants if the block is unchanged and its children are cached, else None."""
+        row = self.conn.execute(
+            "SELECT last_edited_time, children_cached FROM blocks WHERE block_id = ?", (block_id,)
+        ).fetchone()
+        if row is None or not row[1] or row[0] != last_edited_time:
+            return None
+        return self._descendants(block_id)
+
+    def set_children(self, parent_id: str, blocks: list):
+        """
+        Replace the cached listing of a page or block.
+
+        Args:
+            parent_id: Page or block ID the listing belongs to
+            blocks: Raw child blocks in order; their own children must already be cached
+        """
+        with self.conn:
+            self.conn.execute("DELETE FROM blocks WHERE parent_id = ?", (parent_id,))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO blocks (block_id, parent_id, position, last_edited_time, has_children, children_cached, raw) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(block["id"], parent_id, position, block.get("last_edited_time"), int(bool(block.get("has_children"))),
+                  int(bool(block.get("has_children"))), json.dumps(block))
+                 for position, block in enumerate(blocks)]
+            )
+
+    def set_page(self, page_id: str, last_edited_time: str):
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO pages (page_id, last_edited_time) VALUES (?, ?) "
+                "ON CONFLICT(page_id) DO UPDATE SET last_edited_time = excluded.last_edited_time",
+                (page_id, last_edited_time)
+            )
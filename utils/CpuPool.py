@@ -0,0 +1,60 @@
+import os
+import atexit
+import logging
+import multiprocessing
+import concurrent.futures
+from dotenv import load_dotenv
+
+# CpuPool moves CPU-bound transforms (utils.Parsers) off the threads doing network I/O,
+# so a few heavy pages don't stall every concurrent task behind the GIL.
+
+class CpuPool:
+    _executor = None
+
+    @staticmethod
+    def workers() -> int:
+        """Worker processes from CPU_WORKERS, 0 (the default) runs every transform inline."""
+        load_dotenv()
+        return int(os.getenv('CPU_WORKERS', '0'))
+
+    @staticmethod
+    def min_bytes() -> int:
+        """Payloads smaller than CPU_MIN_BYTES stay inline, the round trip would cost more than the work."""
+        return int(os.getenv('CPU_MIN_BYTES', '65536'))
+
+    @classmethod
+    def executor(cls):
+        if cls._executor is None and cls.workers() > 0:
+            # spawn: the callers run threads, forking them is unsafe
+            cls._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=cls.workers(),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            atexit.register(cls.shutdown)
+            logging.info(f"Started CPU pool with {cls.workers()} processes")
+        return cls._executor
+
+    @classmethod
+    def run(cls, func, payload: bytes) -> bytes:
+        """
+        Run a module-level bytes -> bytes transform, in the pool when configured and worth it.
+
+        Args:
+            func: Picklable function taking and returning bytes
+            payload: Encoded input
+        """
+        executor = cls.executor() if len(payload) >= cls.min_bytes() else None
+        if executor is None:
+            return func(payload)
+        try:
+            return executor.submit(func, payload).result()
+        except concurrent.futures.process.BrokenProcessPool as e:
+            logging.warning(f"CPU pool broken ({e}), restarting it and running inline")
+            cls.shutdown()
+            return func(payload)
+
+    @classmethod
+    def shutdown(cls):
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=False, cancel_futures=True)
+            cls._executor = None
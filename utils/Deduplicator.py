@@ -0,0 +1,159 @@
+import os
+import re
+import json
+import random
+import sqlite3
+import hashlib
+import logging
+from dotenv import load_dotenv
+
+# Deduplicator fingerprints article content with word shingles + MinHash and keeps
+# the signatures in a local LSH index (SQLite), so the same story saved from another
+# URL can reuse the theme/keywords/summary already produced instead of calling the LLM.
+
+class Deduplicator:
+    SHINGLE_SIZE = 5
+    NUM_PERM = 120
+    BANDS = 20
+    ROWS = NUM_PERM // BANDS
+    MERSENNE_PRIME = (1 << 61) - 1
+    MAX_HASH = (1 << 32) - 1
+    SEED = 1
+
+    def __init__(self, db_path: str = None, threshold: float = None):
+        """
+        Initialize Deduplicator.
+
+        Args:
+            db_path: Path of the SQLite file holding the LSH index (DEDUP_DB)
+            threshold: Estimated Jaccard similarity above which two articles are duplicates (DEDUP_THRESHOLD)
+        """
+        load_dotenv()
+        self.db_path = db_path or os.getenv('DEDUP_DB', 'dedup.sqlite3')
+        self.threshold = threshold if threshold is not None else float(os.getenv('DEDUP_THRESHOLD', '0.85'))
+        if not 0 < self.threshold <= 1:
+            raise ValueError("DEDUP_THRESHOLD must be in the (0, 1] range")
+
+        # Fixed seed: signatures stored in the index must stay comparable across runs
+        generator = random.Random(self.SEED)
+        self.permutations = [
+            (generator.randint(1, self.MERSENNE_PRIME - 1), generator.randint(0, self.MERSENNE_PRIME - 1))
+            for _ in range(self.NUM_PERM)
+        ]
+
+        self.conn = sqlite3.connect(self.db_path, timeout=float(os.getenv('SQLITE_BUSY_TIMEOUT', '30')))
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                page_id TEXT PRIMARY KEY,
+                signature BLOB NOT NULL,
+                theme TEXT,
+                keywords TEXT,
+                summary TEXT
+            );
+            CREATE TABLE IF NOT EXISTS buckets (
+                bucket INTEGER NOT NULL,
+                page_id TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_buckets_bucket ON buckets (bucket);
+            CREATE INDEX IF NOT EXISTS idx_buckets_page ON buckets (page_id);
+        """)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    @staticmethod
+    def _hash32(value: str) -> int:
+        return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=4).digest(), "little")
+
+    def shingles(self, text: str) -> set:
+        words = re.findall(r"\w+", text.lower())
+        if len(words) <= self.SHINGLE_SIZE:
+            return {" ".join(words)} if words else set()
+        return {" ".join(words[i:i + self.SHINGLE_SIZE]) for i in range(len(words) - self.SHINGLE_SIZE + 1)}
+
+    def signature(self, text: str) -> list:
+        """Compute the MinHash signature of a text, or an empty list when it has no words."""
+        hashes = [self._hash32(shingle) for shingle in self.shingles(text)]
+        if not hashes:
+            return []
+        prime, mask = self.MERSENNE_PRIME, self.MAX_HASH
+        return [min(((a * h + b) % prime) & mask for h in hashes) for a, b in self.permutations]
+
+    def _buckets(self, signature: list) -> list:
+        buckets = []
+        for band in range(self.BANDS):
+            rows = signature[band * self.ROWS:(band + 1) * self.ROWS]
+            key = f"{band}:" + ",".join(map(str, rows))
+            digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+            buckets.append(int.from_bytes(digest, "little", signed=True))
+        return buckets
+
+    @staticmethod
+    def _pack(signature: list) -> bytes:
+        return b"".join(value.to_bytes(4, "little") for value in signature)
+
+    @staticmethod
+    def _unpack(blob: bytes) -> list:
+        return [int.from_bytes(blob[i:i + 4], "little") for i in range(0, len(blob), 4)]
+
+    @staticmethod
+    def similarity(signature_a: list, signature_b: list) -> float:
+        """Estimate the Jaccard similarity of two texts from their signatures."""
+        if not signature_a or len(signature_a) != len(signature_b):
+            return 0.0
+        return sum(1 for a, b in zip(signature_a, signature_b) if a == b) / len(signature_a)
+
+    def find_duplicate(self, signature: list, exclude: str = None):
+        """
+        Look up the most similar indexed article above the threshold that has a summary to copy.
+
+        Args:
+            signature: MinHash signature of the new article
+            exclude: Optional page ID to ignore (the page being reprocessed)
+
+        Returns:
+            A dict with page_id, similarity, theme, keywords and summary, or None
+        """
+        if not signature:
+            return None
+        buckets = self._buckets(signature)
+        placeholders = ",".join("?" * len(buckets))
+        rows = self.conn.execute(
+            f"SELECT DISTINCT d.page_id, d.signature, d.theme, d.keywords, d.summary "
+            f"FROM buckets b JOIN documents d ON d.page_id = b.page_id "
+            f"WHERE b.bucket IN ({placeholders}) AND d.summary IS NOT NULL AND d.summary != ''",
+            buckets
+        ).fetchall()
+
+        best = None
+        for page_id, blob, theme, keywords, summary in rows:
+            if page_id == exclude:
+                continue
+            score = self.similarity(signature, self._unpack(blob))
+            if score >= self.threshold and (best is None or score > best["similarity"]):
+                best = {
+                    "page_id": page_id,
+                    "similarity": score,
+                    "theme": theme,
+                    "keywords": json.loads(keywords) if keywords else [],
+                    "summary": summary,
+                }
+        return best
+
+    def add(self, page_id: str, signature: list, theme: str = None, keywords: list = None, summary: str = None):
+        """Index an article signature together with the results produced for it."""
+        if not signature:
+            return
+        with self.conn:
+            self.conn.execute("DELETE FROM buckets WHERE page_id = ?", (page_id,))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO documents (page_id, signature, theme, keywords, summary) VALUES (?, ?, ?, ?, ?)",
+                (page_id, self._pack(signature), theme, json.dumps(keywords or []), summary)
+            )
+            self.conn.executemany(
+                "INSERT INTO buckets (bucket, page_id) VALUES (?, ?)",
+                [(bucket, page_id) for bucket in self._buckets(signature)]
+            )
+        logging.debug(f"Indexed fingerprint for page ID: {page_id}")
@@ -0,0 +1,33 @@
+import os
+from dotenv import load_dotenv
+
+# The LangChain provider packages are slow to import, so they are only loaded when a
+# model is first built, not when TaskProcessor/main import the LLM modules.
+
+SUPPORTED_LLMS = {'ollama', 'openai', 'azure_openai'}
+
+
+def get_llm(model_name: str):
+    """
+    Build the chat model selected by the LLM environment variable.
+
+    Args:
+        model_name: Model to load (LLM_MODEL)
+    """
+    load_dotenv()
+    llm = os.getenv('LLM', 'ollama')
+    if llm not in SUPPORTED_LLMS:
+        raise ValueError(f"Unsupported LLM type. Must be one of {SUPPORTED_LLMS}")
+
+    if (llm == 'ollama'):
+        from langchain_ollama.llms import OllamaLLM
+        return OllamaLLM(model=model_name)
+
+    api_key = os.getenv("LLM_APIKEY")
+    if not api_key:
+        raise ValueError("API key not found in environment variables")
+    if (llm == 'openai'):
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(model=model_name, api_key=api_key)
+    from langchain_openai import AzureChatOpenAI
+    return AzureChatOpenAI(model=model_name, api_key=api_key)
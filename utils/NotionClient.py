@@ -1,6 +1,13 @@
+import os
+import time
 import requests
 import json
+import concurrent.futures
 from litequeue import LiteQueue
+from utils.NotionReplica import NotionReplica
+from utils.BlockCache import BlockCache
+from utils.CpuPool import CpuPool
+from utils.Parsers import parse_notion_blocks, parse_blocks_bytes
 
 class NotionClient:
     API_VERSION = "2022-06-28"
@@ -19,8 +26,18 @@ class NotionClient:
                         }
                     ]
             }
-    
-    def __init__(self, token: str, database_id: str, queue: LiteQueue = None):
+    # Property projections requested through filter_properties
+    POLL_PROPERTIES = ["Date", "Summary", "Queued", "URL"]
+    DIGEST_PROPERTIES = ["Content", "Date", "Summary", "Read", "URL", "Keywords", "Description", "Abstract"]
+    REPLICA_PROPERTIES = DIGEST_PROPERTIES + ["Queued"]
+    URL_PROPERTIES = ["URL"]
+    # Database schemas (property name -> ID) shared by every client in the process
+    _schemas = {}
+    # When the last schema load failed, per database; requests fall back to full payloads meanwhile
+    _schema_failures = {}
+
+    def __init__(self, token: str, database_id: str, queue: LiteQueue = None, replica: NotionReplica = None,
+                 block_cache: BlockCache = None):
         """
         Initialize NotionClient.
         
@@ -28,6 +45,8 @@ class NotionClient:
             token: Notion API token
             database_id: ID of the target database
             queue: Optional LiteQueue instance for queueing operations
+            replica: Optional NotionReplica serving reads locally
+            block_cache: Optional BlockCache reusing unchanged block subtrees
         """
         self.headers = {
             "Authorization": f"Bearer {token}",
@@ -37,6 +56,8 @@ class NotionClient:
         self.database_id = database_id
         self.url_base = self.BASE_URL
         self.queue = queue
+        self.replica = replica
+        self.block_cache = block_cache
 
     def _handle_error(self, error: Exception, context: str = "") -> None:
         """
@@ -62,113 +83,104 @@ class NotionClient:
     def _patch(self, url, payload: dict) -> requests.Response:
         return requests.patch(url, headers=self.headers, json=payload)
 
-    def retrieving_blocks(self, page_id, next_cursor = ""):
+    def _list_children(self, block_id):
+        """Fetch the direct children of a page or block, following pagination."""
         result = []
-        if (next_cursor == ""):
-            url = f"{self._get_url("blocks")}{page_id}/children?page_size=100" 
-        else: 
-            url = f"{self._get_url("blocks")}{page_id}/children?page_size=100&start_cursor={next_cursor}"
+        next_cursor = ""
+        while True:
+            if (next_cursor == ""):
+                url = f"{self._get_url('blocks')}{block_id}/children?page_size=100"
+            else:
+                url = f"{self._get_url('blocks')}{block_id}/children?page_size=100&start_cursor={next_cursor}"
 
-        response = self._get(url)
-        if response.status_code == 200:
+            response = self._get(url)
+            if response.status_code != 200:
+                return None
             data = response.json()
-            result = self.parse_notion_blocks(data)
-            if data["has_more"]:
-                result.extend(self.retrieving_blocks(page_id, data["next_cursor"]))
-        return result
+            result.extend(data.get("results", []))
+            if not data.get("has_more"):
+                return result
+            next_cursor = data["next_cursor"]
 
-    def parse_notion_blocks(self, notion_api_response):
-        # Ensure notion_api_response is a dictionary
-        if isinstance(notion_api_response, str):
-            notion_api_response = json.loads(notion_api_response)
-
-        # Check if the response has 'results'
-        if not isinstance(notion_api_response, dict) or 'results' not in notion_api_response:
-            return {"error": "Invalid API response format"}
-
-        blocks = notion_api_response.get("results", [])
-        parsed_blocks = []
-
-        text_buffer = []
-        list_buffer = []
-        list_type = None
-
-        def flush_buffers():
-            if text_buffer:
-                parsed_blocks.append("\n".join(text_buffer))
-                text_buffer.clear()
-            if list_buffer:
-                if list_type == "bulleted_list_item":
-                    formatted_list = "\n".join(f"- {item}" for item in list_buffer)
-                elif list_type == "numbered_list_item":
-                    formatted_list = "\n".join(f"{i+1}. {item}" for i, item in enumerate(list_buffer))
-                parsed_blocks.append(formatted_list)
-                list_buffer.clear()
-
-        def extract_text(block):
-            if "text" in block:
-                text_objects = block.get("text", [])
-                return " ".join(text_obj.get("plain_text", "") for text_obj in text_objects if isinstance(text_obj, dict))
-            elif "rich_text" in block:
-                rich_text = block.get("rich_text", [])
-                text_parts = []
-                for text_obj in rich_text:
-                    if isinstance(text_obj, dict) and "text" in text_obj:
-                        text_parts.append(text_obj["text"].get("content", ""))
-                return " ".join(text_parts)
-            return ""
+    def _fetch_children(self, block_id):
+        """
+        Fetch a block tree flattened in document order, reusing cached subtrees of unchanged blocks.
+
+        Args:
+            block_id: Page or block ID whose descendants are fetched
 
-        for block in blocks:
-            if not isinstance(block, dict):
+        Returns:
+            Tuple of the flattened blocks and whether every listing was fetched
+        """
+        children = self._list_children(block_id)
+        if children is None:
+            return [], False
+        result = []
+        complete = True
+        for block in children:
+            result.append(block)
+            # Sub-pages and databases are separate documents, not part of this page's text
+            if not block.get("has_children") or block.get("type") in ("child_page", "child_database"):
                 continue
+            subtree = None
+            if self.block_cache is not None:
+                subtree = self.block_cache.get_subtree(block["id"], block.get("last_edited_time"))
+            if subtree is None:
+                subtree, subtree_complete = self._fetch_children(block["id"])
+                complete = complete and subtree_complete
+            result.extend(subtree)
+        # Partial trees are not cached so the next fetch retries the failed listings
+        if self.block_cache is not None and complete:
+            self.block_cache.set_children(block_id, children)
+        return result, complete
+
+    def _page_edited_time(self, page_id):
+        if self.replica is not None:
+            page = self.replica.get(page_id)
+            if page is not None and page["last_edited_time"]:
+                return page["last_edited_time"]
+        response = self._get(f"{self._get_url('pages')}{page_id}{self._filter_properties(self.URL_PROPERTIES)}")
+        if response.status_code == 200:
+            return response.json().get("last_edited_time")
+        return None
 
-            block_type = block.get("type")
-            content = ""
-
-            if block_type == "paragraph":
-                content = extract_text(block[block_type])
-                if content:
-                    if list_buffer:
-                        flush_buffers()
-                    text_buffer.append(content)
-            elif block_type == "image":
-                if "file" in block[block_type] and "url" in block[block_type]["file"]:
-                    content = block[block_type]["file"]["url"]
-                elif "external" in block[block_type] and "url" in block[block_type]["external"]:
-                    content = block[block_type]["external"]["url"]
-                if content:
-                    flush_buffers()
-                    parsed_blocks.append(content)
-            elif block_type in ["bulleted_list_item", "numbered_list_item"]:
-                content = extract_text(block[block_type])
-                if content:
-                    if list_type is None:
-                        list_type = block_type
-                    if block_type != list_type:
-                        flush_buffers()
-                        list_type = block_type
-                    list_buffer.append(content)
-            elif block_type in ["heading_1", "heading_2", "heading_3"]:
-                content = extract_text(block[block_type])
-                if content:
-                    flush_buffers()
-                    parsed_blocks.append(content)
-            else:
-                flush_buffers()
+    def retrieving_blocks(self, page_id):
+        blocks = None
+        last_edited_time = None
+        if self.block_cache is not None:
+            last_edited_time = self._page_edited_time(page_id)
+            blocks = self.block_cache.get_page(page_id, last_edited_time)
+        if blocks is None:
+            blocks, complete = self._fetch_children(page_id)
+            if self.block_cache is not None and last_edited_time and complete:
+                self.block_cache.set_page(page_id, last_edited_time)
+        # Large block lists are parsed in the process pool when one is configured
+        return json.loads(CpuPool.run(parse_blocks_bytes, json.dumps({"results": blocks}).encode("utf-8")))
 
-        flush_buffers()
-        return parsed_blocks
+    def parse_notion_blocks(self, notion_api_response):
+        return parse_notion_blocks(notion_api_response)
 
     @classmethod
-    def new(cls, token: str, database_id: str, queue: LiteQueue = None):
-        return cls(token, database_id, queue)
+    def new(cls, token: str, database_id: str, queue: LiteQueue = None, replica: NotionReplica = None,
+            block_cache: BlockCache = None):
+        return cls(token, database_id, queue, replica, block_cache)
 
     def get_page(self, page_id):
+        if self.replica is not None:
+            output = self.replica.get_content(page_id)
+            if output is not None:
+                return output
         output = " \n ".join(self.retrieving_blocks(page_id))
+        if self.replica is not None and output:
+            self.replica.set_content(page_id, output)
         return output
 
     def get_page_url(self, page_id):
-        url = f"{self._get_url('pages')}{page_id}"
+        if self.replica is not None:
+            source_url = self.replica.get_source_url(page_id)
+            if source_url:
+                return source_url
+        url = f"{self._get_url('pages')}{page_id}{self._filter_properties(self.URL_PROPERTIES)}"
         try:
             response = self._get(url)
             if response.status_code == 200:
@@ -178,111 +190,360 @@ class NotionClient:
             return self._handle_error(e)
         return 
 
-    def get_database(self):
-        url = f"{self._get_url("databases")}{self.database_id}"
+    def get_schema(self, refresh: bool = False):
+        """
+        Load the database schema, cached per database for the life of the process.
+
+        A failed load is not retried for NOTION_SCHEMA_RETRY seconds (default 300), so every
+        request does not fetch the database again.
+
+        Args:
+            refresh: Reload the schema from Notion even if it is cached
+
+        Returns:
+            Dict mapping property names to property IDs (empty if the schema could not be loaded)
+        """
+        if not refresh and self.database_id in self._schemas:
+            return self._schemas[self.database_id]
+        failed_at = self._schema_failures.get(self.database_id)
+        if not refresh and failed_at is not None and \
+                time.monotonic() - failed_at < float(os.getenv('NOTION_SCHEMA_RETRY', '300')):
+            return {}
+        url = f"{self._get_url('databases')}{self.database_id}"
         try:
             response = self._get(url)
-            if response.status_code == 200:
-                data = response.json()
-                for property_value in data["properties"]:
-                    print(data["properties"][property_value])
+            if response.status_code != 200:
+                raise Exception(response.text)
+            data = response.json()
+            schema = {name: prop["id"] for name, prop in data["properties"].items()}
+            self._schemas[self.database_id] = schema
+            self._schema_failures.pop(self.database_id, None)
+            return schema
         except Exception as e:
-            return self._handle_error(e)
-        return response
+            self._handle_error(e, "get_schema")
+            self._schema_failures[self.database_id] = time.monotonic()
+            return {}
+
+    def _filter_properties(self, names):
+        """Build the filter_properties query string for a projection, or "" to fetch every property."""
+        schema = self.get_schema()
+        ids = [schema[name] for name in names if name in schema]
+        if not ids:
+            return ""
+        return "?" + "&".join(f"filter_properties={prop_id}" for prop_id in ids)
 
-    def database_queue(self, filter = None):
+    def parse_page(self, item):
+        """
+        Flatten a Notion page object into the properties used by the queue, digests and replica.
+
+        Args:
+            item: Page object as returned by the Notion API
+        """
+        properties = item.get("properties", {})
+        date_value = (properties.get("Date") or {}).get("date") or {}
+
+        title = ""
+        for txt in (properties.get("Content") or {"title": []}).get("title", []):
+            if txt.get("type") == "text":
+                title += txt.get("text").get("content")
+
+        description = ""
+        for desc in (properties.get("Description") or {"rich_text": []}).get("rich_text", []):
+            description += desc.get("plain_text", "")
+
+        keywords = [keyword["name"] for keyword in (properties.get("Keywords") or {"multi_select": []}).get("multi_select", [])]
+
+        abstract = None
+        abstract_prop = properties.get("Abstract")
+        if abstract_prop is not None:
+            abstract = ""
+            for chunk in abstract_prop.get("rich_text", []):
+                if isinstance(chunk, dict) and "text" in chunk:
+                    abstract += chunk["text"].get("content", "")
+
+        return {
+            "id": item.get("id"),
+            "url": item.get("url"),
+            "database_id": self.database_id,
+            "date": date_value.get("start"),
+            "summary": (properties.get("Summary") or {}).get("checkbox", False),
+            "read": (properties.get("Read") or {}).get("checkbox", False),
+            "queued": (properties.get("Queued") or {}).get("checkbox", False),
+            "source_url": (properties.get("URL") or {}).get("url"),
+            "title": title,
+            "description": description,
+            "keywords": keywords,
+            "abstract": abstract,
+            "created_time": item.get("created_time"),
+            "last_edited_time": item.get("last_edited_time"),
+        }
+
+    def _query_pages(self, payload, properties = None):
+        """
+        Yield every page matching a database query payload, following pagination.
+
+        Args:
+            payload: Query body (filter, sorts)
+            properties: Optional projection of property names to return
+        """
         url = f"{self._get_url('databases')}{self.database_id}/query"
+        if properties is not None:
+            url += self._filter_properties(properties)
+        payload = dict(payload)
+        while True:
+            response = self._post(url, payload)
+            if response.status_code != 200:
+                self._handle_error(Exception(response.text), "database query")
+                return
+            data = response.json()
+            if not data or "results" not in data:
+                print("Warning: No results found in response")
+                return
+
+            for item in data["results"]:
+                if not item or "properties" not in item:
+                    print(f"Warning: Invalid item structure: {item}")
+                    continue
+                yield item
+
+            if not data.get("has_more"):
+                return
+            payload["start_cursor"] = data["next_cursor"]
+
+    def _live_page_ids(self):
+        """IDs of every page currently in the database, or None if the listing failed part way."""
+        url = f"{self._get_url('databases')}{self.database_id}/query{self._filter_properties(['Content'])}"
+        payload = {"page_size": 100}
+        page_ids = set()
+        while True:
+            response = self._post(url, payload)
+            if response.status_code != 200:
+                self._handle_error(Exception(response.text), "replica sweep")
+                return None
+            data = response.json()
+            page_ids.update(item["id"] for item in data.get("results", []))
+            if not data.get("has_more"):
+                return page_ids
+            payload["start_cursor"] = data["next_cursor"]
+
+    def sweep_replica(self, force: bool = False):
+        """
+        Drop replica pages that were deleted, archived or trashed in Notion.
+
+        Delta syncs never see those pages (database queries skip them), so every
+        NOTION_REPLICA_SWEEP_INTERVAL seconds the live page IDs are listed and compared.
+
+        Args:
+            force: Sweep even if the interval has not elapsed
+
+        Returns:
+            Number of pages removed
+        """
+        if self.replica is None:
+            return 0
+        interval = float(os.getenv('NOTION_REPLICA_SWEEP_INTERVAL', '86400'))
+        swept_at = self.replica.get_swept_at(self.database_id)
+        if not force and swept_at is not None and time.time() - swept_at < interval:
+            return 0
+        started = time.time()
+        live = self._live_page_ids()
+        if live is None:
+            return 0
+        # Pages edited just now may have been synced by another process after the listing; keep them
+        recent = self._iso(started - 120)
+        gone = [page_id for page_id in self.replica.page_ids(self.database_id) - live
+                if ((self.replica.get(page_id) or {}).get("last_edited_time") or "") < recent]
+        self.replica.delete_pages(gone)
+        self.replica.set_swept_at(self.database_id, started)
+        if gone:
+            print(f"Removed {len(gone)} deleted pages from the replica")
+        return len(gone)
+
+    @staticmethod
+    def _iso(timestamp: float) -> str:
+        return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(timestamp))
+
+    @staticmethod
+    def _is_gone(response) -> bool:
+        """Whether a page request failed because the page was deleted, archived or trashed."""
+        if response.status_code == 404:
+            return True
+        return response.status_code == 400 and "archived" in response.text.lower()
+
+    def sync_replica(self):
+        """
+        Pull pages edited since the last sync into the local replica.
+
+        Returns:
+            Number of pages stored or removed
+        """
+        if self.replica is None:
+            return 0
+        cursor = self.replica.get_cursor(self.database_id)
+        if cursor:
+            self.sweep_replica()
+        else:
+            # A full sync sees every live page, no sweep needed until the interval elapses
+            self.replica.set_swept_at(self.database_id, time.time())
+        payload = {"sorts": [{"timestamp": "last_edited_time", "direction": "ascending"}]}
+        if cursor:
+            # Notion rounds last_edited_time to the minute, so the boundary minute is re-read
+            payload["filter"] = {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": cursor}}
+
+        synced = 0
+        batch = []
+        removed = []
+        for item in self._query_pages(payload, self.REPLICA_PROPERTIES):
+            page = self.parse_page(item)
+            if item.get("archived") or item.get("in_trash"):
+                removed.append(page["id"])
+            else:
+                batch.append(page)
+            cursor = max(cursor or "", page["last_edited_time"] or "")
+            if len(batch) + len(removed) >= 100:
+                self.replica.upsert_pages(batch)
+                self.replica.delete_pages(removed)
+                self.replica.set_cursor(self.database_id, cursor)
+                synced += len(batch) + len(removed)
+                batch, removed = [], []
+        self.replica.upsert_pages(batch)
+        self.replica.delete_pages(removed)
+        if cursor:
+            self.replica.set_cursor(self.database_id, cursor)
+        return synced + len(batch) + len(removed)
+
+    def database_queue(self, filter = None):
         output = {}
         try:
-            payload = {"filter": {"and": [{"property": "Summary",
-                    "checkbox": {
-                        "equals": False
-                    }},{"property": "Queued",
-                    "checkbox": {
-                        "equals": False
-                    }}]}}
-            if (filter is not None):
-                payload = filter
-            response = self._post(url, payload)
-            if response.status_code == 200:
-                data = response.json()
-                # Add check for results
-                if not data or "results" not in data:
-                    print("Warning: No results found in response")
-                    return output
-
-                for item in data["results"]:
-                    if not item or "properties" not in item:
-                        print(f"Warning: Invalid item structure: {item}")
-                        continue
-                        
-                    page = {}
-                    page["id"] = item.get("id")
-                    page["url"] = item.get("url")
-                    page["database_id"] = self.database_id
-                    
-                    # Safer property access with default values
-                    properties = item.get("properties", {})
-                    date_prop = properties.get("Date", {})
-                    date_value = date_prop.get("date", {})
-                    page["date"] = date_value.get("start") if date_value else None
-                    
-                    page["summary"] = properties.get("Summary", {}).get("checkbox", False)
-
-                    if page["date"] is None and "created_time" in item:
-                        self.page_date_update(page["id"], item["created_time"][0:10])
-
-                    if not page["summary"]:
-                        page_str = json.dumps(page)
-                        if self.queue is not None:
-                            self.queue.put(page_str)
-                            self.page_queued(page["id"])
-
-                    content = properties.get("Content", {"title": []})
-                    page["title"] = ""
-                    for txt in content["title"]:
-                        if txt["type"] == "text":
-                            page["title"] += txt.get("text").get("content")
-                    # Safer property access for Read and Abstract
-                    read_prop = properties.get("Read", {"checkbox": True})
-                    if read_prop is not True:
-                        output[page["date"]] = output.get(page["date"], [])
-                        description_pop = properties.get("Description", {"rich_text": []}) 
-                        description = ""
-                        for desc in description_pop["rich_text"]:
-                            description += desc.get("plain_text","")
-                        page["description"] = description
-
-                        keywords = properties.get("Keywords", {"multi_select": []}) 
-                        page["tag"] = ""
-                        for keyword in keywords["multi_select"]:
-                            page["tag"] += f" {keyword['name']}, "
-
-                        abstract = ""
-                        abstract_prop = properties.get("Abstract")
-                        if abstract_prop is not None:
-                            for chunk in abstract_prop.get("rich_text", []):
-                                if isinstance(chunk, dict) and "text" in chunk:
-                                    abstract += chunk["text"].get("content", "")
-                            page["abstract"] = abstract
-                            output[page["date"]].append(page)
+            if self.replica is not None and (filter is None or filter == self.NEWS_FILTER):
+                # Only deltas go to Notion, selection is served from the replica
+                self.sync_replica()
+                if filter is None:
+                    pages = self.replica.pending(self.database_id)
+                else:
+                    pages = self.replica.news(self.database_id)
+            else:
+                payload = {"filter": {"and": [{"property": "Summary",
+                        "checkbox": {
+                            "equals": False
+                        }},{"property": "Queued",
+                        "checkbox": {
+                            "equals": False
+                        }}]}}
+                properties = self.POLL_PROPERTIES
+                if (filter is not None):
+                    payload = filter
+                    properties = self.DIGEST_PROPERTIES
+                pages = [self.parse_page(item) for item in self._query_pages(payload, properties)]
+
+            for item in pages:
+                page = {}
+                page["id"] = item["id"]
+                page["url"] = item["url"]
+                page["database_id"] = self.database_id
+                page["date"] = item["date"]
+                page["summary"] = item["summary"]
+
+                if page["date"] is None and item.get("created_time"):
+                    self.page_date_update(page["id"], item["created_time"][0:10])
+
+                if not page["summary"]:
+                    page_str = json.dumps(page)
+                    if self.queue is not None:
+                        self.queue.put(page_str)
+                        self.page_queued(page["id"])
+
+                page["title"] = item["title"]
+                if not item["read"]:
+                    output[page["date"]] = output.get(page["date"], [])
+                    page["description"] = item["description"]
+                    page["tag"] = "".join(f" {keyword}, " for keyword in item["keywords"])
+                    if item["abstract"] is not None:
+                        page["abstract"] = item["abstract"]
+                        output[page["date"]].append(page)
 
             return output
         except Exception as e:
             return self._handle_error(e)
     
+    def iter_news(self):
+        """
+        Lazily yield summarized, unread articles oldest first (NEWS_FILTER), ready for QuickReader.
+
+        Served from the replica after a delta sync when available, otherwise paged from the API.
+        """
+        if self.replica is not None:
+            self.sync_replica()
+            pages = self.replica.iter_news(self.database_id)
+        else:
+            pages = (self.parse_page(item) for item in self._query_pages(self.NEWS_FILTER, self.DIGEST_PROPERTIES))
+        for page in pages:
+            yield {
+                "id": page["id"],
+                "url": page["url"],
+                "database_id": self.database_id,
+                "date": page["date"],
+                "title": page["title"],
+                "description": page["description"],
+                "tag": "".join(f" {keyword}, " for keyword in page["keywords"]),
+                "abstract": page["abstract"] or "",
+                "last_edited_time": page["last_edited_time"],
+            }
+
     def page_update(self, page_id, properties):
-        url = f"{self._get_url("pages")}{page_id}"
+        url = f"{self._get_url('pages')}{page_id}"
         try:
             payload = {"properties": properties}
             response = self._patch(url, payload)
             if response.status_code != 200:
+                if self.replica is not None and self._is_gone(response):
+                    self.replica.delete_pages([page_id])
                 raise Exception(response.json())
+            if self.replica is not None:
+                # Write-through so local reads see our own updates before the next sync
+                self.replica.upsert_pages([self.parse_page(response.json())])
             return response
 
         except Exception as e:
             return self._handle_error(e)
 
+    def pages_mark_read(self, page_ids, max_workers: int = 3):
+        """
+        Mark many pages as Read, a few requests in flight at a time (Notion has no bulk update endpoint).
+
+        Args:
+            page_ids: Pages to update
+            max_workers: Concurrent requests, kept around Notion's ~3 requests/second limit
+
+        Returns:
+            IDs of the pages successfully updated
+        """
+        payload = {"properties": {"Read": {"type": "checkbox", "checkbox": True}}}
+        updated = []
+        pages = []
+        gone = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self._patch, f"{self._get_url('pages')}{page_id}", payload): page_id
+                       for page_id in page_ids}
+            for future in concurrent.futures.as_completed(futures):
+                page_id = futures[future]
+                try:
+                    response = future.result()
+                    if response.status_code != 200:
+                        if self._is_gone(response):
+                            gone.append(page_id)
+                        raise Exception(response.json())
+                    updated.append(page_id)
+                    pages.append(self.parse_page(response.json()))
+                except Exception as e:
+                    self._handle_error(e, f"marking {page_id} as read")
+        # The replica connection belongs to this thread, so write-through happens after the requests
+        if self.replica is not None:
+            self.replica.upsert_pages(pages)
+            # Deleted in Notion: drop them so they stop coming back in digests
+            self.replica.delete_pages(gone)
+        return updated
+
     def page_date_update(self, page_id, date):
         try:
             payload = {"Date": {"type": "date","date": {"start": date}}}
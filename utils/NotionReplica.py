@@ -0,0 +1,184 @@
+import os
+import json
+import sqlite3
+from dotenv import load_dotenv
+
+# NotionReplica is a local SQLite copy of the Notion database, kept in sync from
+# `last_edited_time` deltas, so read paths (queue selection, digests, URL lookups,
+# page text) don't spend Notion rate-limit budget on data already seen.
+
+class NotionReplica:
+    COLUMNS = ("id", "database_id", "url", "title", "date", "summary", "read", "queued", "source_url",
+               "description", "keywords", "abstract", "created_time", "last_edited_time")
+
+    def __init__(self, db_path: str = None):
+        """
+        Initialize NotionReplica.
+
+        Args:
+            db_path: Path of the SQLite replica file (NOTION_REPLICA_DB)
+        """
+        load_dotenv()
+        self.db_path = db_path or os.getenv('NOTION_REPLICA_DB', 'notion.sqlite3')
+        self.conn = sqlite3.connect(self.db_path, timeout=float(os.getenv('SQLITE_BUSY_TIMEOUT', '30')))
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (
+                id TEXT PRIMARY KEY,
+                database_id TEXT NOT NULL,
+                url TEXT,
+                title TEXT,
+                date TEXT,
+                summary INTEGER NOT NULL DEFAULT 0,
+                read INTEGER NOT NULL DEFAULT 0,
+                queued INTEGER NOT NULL DEFAULT 0,
+                source_url TEXT,
+                description TEXT,
+                keywords TEXT,
+                abstract TEXT,
+                created_time TEXT,
+                last_edited_time TEXT,
+                content TEXT,
+                content_edited_time TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_pages_date ON pages (database_id, date);
+            CREATE INDEX IF NOT EXISTS idx_pages_pending ON pages (database_id, summary, queued);
+            CREATE INDEX IF NOT EXISTS idx_pages_news ON pages (database_id, summary, read, date);
+            CREATE TABLE IF NOT EXISTS page_keywords (
+                page_id TEXT NOT NULL,
+                keyword TEXT NOT NULL,
+                PRIMARY KEY (keyword, page_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_page_keywords_page ON page_keywords (page_id);
+            CREATE TABLE IF NOT EXISTS sync_state (
+                database_id TEXT PRIMARY KEY,
+                last_edited_time TEXT,
+                swept_at REAL
+            );
+        """)
+        # Replicas created before deletion sweeps existed
+        columns = [row["name"] for row in self.conn.execute("PRAGMA table_info(sync_state)")]
+        if "swept_at" not in columns:
+            self.conn.execute("ALTER TABLE sync_state ADD COLUMN swept_at REAL")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def _to_page(self, row):
+        if row is None:
+            return None
+        page = dict(row)
+        page["keywords"] = json.loads(page["keywords"]) if page["keywords"] else []
+        page["summary"] = bool(page["summary"])
+        page["read"] = bool(page["read"])
+        page["queued"] = bool(page["queued"])
+        return page
+
+    def get_cursor(self, database_id: str):
+        row = self.conn.execute("SELECT last_edited_time FROM sync_state WHERE database_id = ?", (database_id,)).fetchone()
+        return row["last_edited_time"] if row else None
+
+    def set_cursor(self, database_id: str, last_edited_time: str):
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO sync_state (database_id, last_edited_time) VALUES (?, ?) "
+                "ON CONFLICT(database_id) DO UPDATE SET last_edited_time = excluded.last_edited_time",
+                (database_id, last_edited_time)
+            )
+
+    def get_swept_at(self, database_id: str):
+        row = self.conn.execute("SELECT swept_at FROM sync_state WHERE database_id = ?", (database_id,)).fetchone()
+        return row["swept_at"] if row else None
+
+    def set_swept_at(self, database_id: str, swept_at: float):
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO sync_state (database_id, swept_at) VALUES (?, ?) "
+                "ON CONFLICT(database_id) DO UPDATE SET swept_at = excluded.swept_at",
+                (database_id, swept_at)
+            )
+
+    def page_ids(self, database_id: str) -> set:
+        return {row["id"] for row in self.conn.execute("SELECT id FROM pages WHERE database_id = ?", (database_id,))}
+
+    def upsert_pages(self, pages: list):
+        """
+        Store pages parsed by NotionClient.parse_page, keeping any cached page text.
+
+        Args:
+            pages: List of parsed page dicts
+        """
+        with self.conn:
+            for page in pages:
+                values = [page.get(column) for column in self.COLUMNS]
+                values[self.COLUMNS.index("keywords")] = json.dumps(page.get("keywords", []))
+                for flag in ("summary", "read", "queued"):
+                    values[self.COLUMNS.index(flag)] = int(bool(page.get(flag)))
+                updates = ", ".join(f"{column} = excluded.{column}" for column in self.COLUMNS[1:])
+                self.conn.execute(
+                    f"INSERT INTO pages ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))}) "
+                    f"ON CONFLICT(id) DO UPDATE SET {updates}",
+                    values
+                )
+                self.conn.execute("DELETE FROM page_keywords WHERE page_id = ?", (page["id"],))
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO page_keywords (page_id, keyword) VALUES (?, ?)",
+                    [(page["id"], keyword) for keyword in page.get("keywords", [])]
+                )
+
+    def delete_pages(self, page_ids: list):
+        with self.conn:
+            self.conn.executemany("DELETE FROM pages WHERE id = ?", [(page_id,) for page_id in page_ids])
+            self.conn.executemany("DELETE FROM page_keywords WHERE page_id = ?", [(page_id,) for page_id in page_ids])
+
+    def get(self, page_id: str):
+        return self._to_page(self.conn.execute("SELECT * FROM pages WHERE id = ?", (page_id,)).fetchone())
+
+    def pending(self, database_id: str) -> list:
+        """Pages not summarized nor queued yet."""
+        rows = self.conn.execute(
+            "SELECT * FROM pages WHERE database_id = ? AND summary = 0 AND queued = 0 ORDER BY date",
+            (database_id,)
+        )
+        return [self._to_page(row) for row in rows]
+
+    def iter_news(self, database_id: str):
+        """Lazily yield summarized pages not read yet, oldest first (NotionClient.NEWS_FILTER)."""
+        rows = self.conn.execute(
+            "SELECT * FROM pages WHERE database_id = ? AND summary = 1 AND read = 0 ORDER BY date",
+            (database_id,)
+        )
+        for row in rows:
+            yield self._to_page(row)
+
+    def news(self, database_id: str) -> list:
+        return list(self.iter_news(database_id))
+
+    def by_keyword(self, database_id: str, keyword: str) -> list:
+        rows = self.conn.execute(
+            "SELECT p.* FROM page_keywords k JOIN pages p ON p.id = k.page_id "
+            "WHERE k.keyword = ? AND p.database_id = ? ORDER BY p.date",
+            (keyword, database_id)
+        )
+        return [self._to_page(row) for row in rows]
+
+    def get_source_url(self, page_id: str):
+        row = self.conn.execute("SELECT source_url FROM pages WHERE id = ?", (page_id,)).fetchone()
+        return row["source_url"] if row else None
+
+    def get_content(self, page_id: str):
+        """Return the cached page text if it is still current for the page's last_edited_time."""
+        row = self.conn.execute(
+            "SELECT content FROM pages WHERE id = ? AND content IS NOT NULL AND content_edited_time = last_edited_time",
+            (page_id,)
+        ).fetchone()
+        return row["content"] if row else None
+
+    def set_content(self, page_id: str, content: str):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE pages SET content = ?, content_edited_time = last_edited_time WHERE id = ?",
+                (content, page_id)
+            )
@@ -0,0 +1,154 @@
+import json
+import re
+
+# Pure, CPU-bound transforms (HTML to text, Notion block parsing, LLM output cleanup).
+# The *_bytes variants take and return compact UTF-8/JSON bytes so they can run in
+# the CpuPool worker processes without pickling rich objects.
+
+
+def html_to_text(content: bytes) -> str:
+    """Extract the visible text of an HTML page."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(content, 'html.parser')
+    return soup.get_text(separator=' ', strip=True)
+
+
+def html_to_text_bytes(content: bytes) -> bytes:
+    return html_to_text(content).encode("utf-8")
+
+
+def parse_notion_blocks(notion_api_response):
+    """Flatten Notion blocks (an API response or {"results": blocks}) into text chunks."""
+    # Ensure notion_api_response is a dictionary
+    if isinstance(notion_api_response, str):
+        notion_api_response = json.loads(notion_api_response)
+
+    # Check if the response has 'results'
+    if not isinstance(notion_api_response, dict) or 'results' not in notion_api_response:
+        return {"error": "Invalid API response format"}
+
+    blocks = notion_api_response.get("results", [])
+    parsed_blocks = []
+
+    text_buffer = []
+    list_buffer = []
+    list_type = None
+
+    def flush_buffers():
+        if text_buffer:
+            parsed_blocks.append("\n".join(text_buffer))
+            text_buffer.clear()
+        if list_buffer:
+            if list_type == "bulleted_list_item":
+                formatted_list = "\n".join(f"- {item}" for item in list_buffer)
+            elif list_type == "numbered_list_item":
+                formatted_list = "\n".join(f"{i+1}. {item}" for i, item in enumerate(list_buffer))
+            parsed_blocks.append(formatted_list)
+            list_buffer.clear()
+
+    def extract_text(block):
+        if "text" in block:
+            text_objects = block.get("text", [])
+            return " ".join(text_obj.get("plain_text", "") for text_obj in text_objects if isinstance(text_obj, dict))
+        elif "rich_text" in block:
+            rich_text = block.get("rich_text", [])
+            text_parts = []
+            for text_obj in rich_text:
+                if isinstance(text_obj, dict) and "text" in text_obj:
+                    text_parts.append(text_obj["text"].get("content", ""))
+            return " ".join(text_parts)
+        return ""
+
+    for block in blocks:
+        if not isinstance(block, dict):
+            continue
+
+        block_type = block.get("type")
+        content = ""
+
+        if block_type == "paragraph":
+            content = extract_text(block[block_type])
+            if content:
+                if list_buffer:
+                    flush_buffers()
+                text_buffer.append(content)
+        elif block_type == "image":
+            if "file" in block[block_type] and "url" in block[block_type]["file"]:
+                content = block[block_type]["file"]["url"]
+            elif "external" in block[block_type] and "url" in block[block_type]["external"]:
+                content = block[block_type]["external"]["url"]
+            if content:
+                flush_buffers()
+                parsed_blocks.append(content)
+        elif block_type in ["bulleted_list_item", "numbered_list_item"]:
+            content = extract_text(block[block_type])
+            if content:
+                if list_type is None:
+                    list_type = block_type
+                if block_type != list_type:
+                    flush_buffers()
+                    list_type = block_type
+                list_buffer.append(content)
+        elif block_type in ["heading_1", "heading_2", "heading_3"]:
+            content = extract_text(block[block_type])
+            if content:
+                flush_buffers()
+                parsed_blocks.append(content)
+        else:
+            flush_buffers()
+
+    flush_buffers()
+    return parsed_blocks
+
+
+def parse_blocks_bytes(payload: bytes) -> bytes:
+    return json.dumps(parse_notion_blocks(json.loads(payload))).encode("utf-8")
+
+
+def parse_theme_result(result: str, max_theme_length: int) -> dict:
+    """Split the ThemeExtractor LLM output into a theme and cleaned-up keywords."""
+    # Split result into theme and keywords sections
+    theme_section = ""
+    keywords = []
+
+    # Extract theme and keywords using regex
+    match = re.search("\\*\\*Main Theme:\\*\\*(.*?)\\*\\*Keywords:\\*\\*(.*)", result, re.DOTALL)
+
+    if match:
+        theme_section = match.group(1).strip()
+        keywords_text = match.group(2).strip()
+        # Split keywords by comma, newline or bullet points
+        raw_keywords = [k.strip('- ') for k in re.split(r',|\n|- ', keywords_text) if k.strip('- ')]
+
+        # Clean up each keyword
+        for keyword in raw_keywords:
+            # Remove common patterns and clean up
+            cleaned = keyword.strip()
+            # Remove numbering (e.g., "1. ", "2. ")
+            cleaned = re.sub(r'^\d+\.\s*', '', cleaned)
+            # Remove asterisks
+            cleaned = re.sub(r'\*+', '', cleaned)
+            cleaned = re.sub(r'^\*\s*', '', cleaned)
+            # Remove dashes at start
+            cleaned = re.sub(r'^-\s*', '', cleaned)
+            # Remove any remaining leading/trailing whitespace
+            cleaned = cleaned.strip()
+            # Convert to lowercase
+            cleaned = cleaned.lower()
+
+            if cleaned:  # Only add non-empty keywords
+                keywords.append(cleaned)
+    else:
+        # Fallback if pattern not found
+        theme_section = result
+        keywords = []
+
+    return {
+        "theme": theme_section[:max_theme_length],
+        "keywords": keywords
+    }
+
+
+def parse_theme_bytes(payload: bytes) -> bytes:
+    result, max_theme_length = json.loads(payload)
+    return json.dumps(parse_theme_result(result, max_theme_length)).encode("utf-8")
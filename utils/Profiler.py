@@ -0,0 +1,175 @@
+import os
+import io
+import sys
+import time
+import pstats
+import signal
+import cProfile
+import logging
+import threading
+import contextlib
+import tracemalloc
+from datetime import datetime
+from dotenv import load_dotenv
+
+# TaskProfiler wraps a sample of the tasks run by TaskProcessor in cProfile and
+# tracemalloc and writes one dump per task, so a slow article shows whether the time
+# went to block pagination, scraping, parsing or the model. It is switched on with
+# PROFILE_TASKS or toggled at runtime with SIGUSR1, without restarting the daemon.
+
+_current = threading.local()
+
+
+class TaskProfile:
+    """Profiling state of one task; callers tag it with the page being processed."""
+
+    def __init__(self):
+        self.tags = {}
+        self.profiler = cProfile.Profile()
+        self.snapshot = None
+        self.snapshot_size = 0
+        self._done = threading.Event()
+
+    def watch_memory(self, interval: float):
+        """Snapshot the allocations each time traced memory grows 10% past the last snapshot, approximating the peak."""
+        while not self._done.wait(interval):
+            current, _ = tracemalloc.get_traced_memory()
+            if current > self.snapshot_size * 1.1:
+                self.snapshot = tracemalloc.take_snapshot()
+                self.snapshot_size = current
+
+    def stats(self, stream):
+        return pstats.Stats(self.profiler, stream=stream)
+
+
+class TaskProfiler:
+    _enabled = None
+    _toggled = False
+    _count = 0
+
+    @classmethod
+    def enabled(cls) -> bool:
+        if cls._enabled is None:
+            load_dotenv()
+            cls._enabled = os.getenv('PROFILE_TASKS', '0').lower() in ('1', 'true', 'yes')
+        return cls._enabled
+
+    @classmethod
+    def toggle(cls, signum=None, frame=None):
+        # Runs as a signal handler: only flip the flag, the next task logs the change
+        cls._enabled = not cls.enabled()
+        cls._toggled = True
+
+    @classmethod
+    def install_signal_handler(cls):
+        """Toggle profiling on SIGUSR1 (no-op where the signal does not exist)."""
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, cls.toggle)
+
+    @staticmethod
+    def sample_rate() -> int:
+        """Profile 1 in PROFILE_SAMPLE tasks (default 10)."""
+        return max(1, int(os.getenv('PROFILE_SAMPLE', '10')))
+
+    @staticmethod
+    def output_dir() -> str:
+        return os.getenv('PROFILE_DIR', 'profiles')
+
+    @classmethod
+    def _sampled(cls) -> bool:
+        if cls._toggled:
+            cls._toggled = False
+            logging.info(f"Task profiling {'enabled' if cls.enabled() else 'disabled'}")
+        if not cls.enabled():
+            return False
+        cls._count += 1
+        return (cls._count - 1) % cls.sample_rate() == 0
+
+    @classmethod
+    @contextlib.contextmanager
+    def task(cls):
+        """
+        Profile the enclosed task when profiling is enabled and the task is sampled.
+
+        Yields the TaskProfile (or None); set its "page_id" and "content_length" tags.
+        Tasks left without a page_id are not written or counted.
+        """
+        if not cls._sampled():
+            yield None
+            return
+
+        profile = TaskProfile()
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(int(os.getenv('PROFILE_FRAMES', '10')))
+        tracemalloc.reset_peak()
+        _current.profile = profile
+        watcher = threading.Thread(target=profile.watch_memory, name="profile-memory", daemon=True,
+                                   args=(float(os.getenv('PROFILE_MEMORY_INTERVAL', '0.5')),))
+        watcher.start()
+        start_time = time.perf_counter()
+        profile.profiler.enable()
+        try:
+            yield profile
+        finally:
+            profile.profiler.disable()
+            elapsed = time.perf_counter() - start_time
+            _current.profile = None
+            profile._done.set()
+            watcher.join()
+            current, peak = tracemalloc.get_traced_memory()
+            if profile.snapshot is None or current > profile.snapshot_size:
+                profile.snapshot, profile.snapshot_size = tracemalloc.take_snapshot(), current
+            if started_tracing:
+                tracemalloc.stop()
+            if profile.tags.get("page_id"):
+                try:
+                    cls._dump(profile, elapsed, peak)
+                except Exception as e:
+                    logging.warning(f"Failed to write task profile: {e}")
+            else:
+                cls._count -= 1
+
+    @staticmethod
+    def single_threaded() -> bool:
+        """
+        Whether the current task must run its work in this thread to be profiled.
+
+        From Python 3.12 cProfile traces every thread, before that it only sees the thread
+        it was enabled in, and a second profiler cannot be started alongside it. Sampled
+        tasks on older versions therefore run theme and summary one after the other.
+        """
+        return getattr(_current, "profile", None) is not None and sys.version_info < (3, 12)
+
+    @classmethod
+    def _dump(cls, profile, elapsed, peak):
+        directory = cls.output_dir()
+        os.makedirs(directory, exist_ok=True)
+        page_id = profile.tags["page_id"]
+        content_length = profile.tags.get("content_length") or 0
+        base = os.path.join(directory, f"{datetime.now():%Y%m%d-%H%M%S}-{page_id}-{content_length}")
+
+        report = io.StringIO()
+        stats = profile.stats(report)
+        stats.dump_stats(f"{base}.prof")
+
+        top = int(os.getenv('PROFILE_TOP', '25'))
+        report.write(f"page_id: {page_id}\n")
+        for key, value in profile.tags.items():
+            if key != "page_id":
+                report.write(f"{key}: {value}\n")
+        report.write(f"wall_time: {elapsed:.2f}s\n")
+        report.write(f"peak_memory: {peak / 1024 / 1024:.1f} MiB (Python allocations, this process)\n\n")
+        report.write(f"Top allocators (snapshot at {profile.snapshot_size / 1024 / 1024:.1f} MiB):\n")
+        for statistic in profile.snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ]).statistics("lineno")[:top]:
+            report.write(f"  {statistic}\n")
+        report.write("\n")
+        stats.sort_stats("cumulative").print_stats(top)
+
+        with open(f"{base}.txt", "w") as f:
+            f.write(report.getvalue())
+        logging.info(f"Wrote task profile for page ID {page_id} ({elapsed:.2f}s, "
+                     f"peak {peak / 1024 / 1024:.1f} MiB) to {base}.txt")
@@ -1,7 +1,123 @@
+import os
+import sys
 import uuid
-from datetime import datetime
+import html
+import logging
+import sqlite3
+import zipfile
+from datetime import datetime, timezone
+from dotenv import load_dotenv
 # QuickReader shall aggregate summaries generated within Notion and synthesize them into an EPUB format, facilitating reading on Kindle devices.
 
+
+class EpubWriter:
+    """Writes an EPUB 3 container incrementally: chapters go straight into the zip stream, the package files last."""
+
+    CONTAINER_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+    <rootfiles>
+        <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+    </rootfiles>
+</container>
+"""
+
+    PACKAGE_TEMPLATE = """<?xml version="1.0" encoding="utf-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="id">
+    <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+        <dc:identifier id="id">{identifier}</dc:identifier>
+        <dc:title>{title}</dc:title>
+        <dc:language>en</dc:language>
+        <meta property="dcterms:modified">{modified}</meta>
+    </metadata>
+    <manifest>
+        <item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>
+        {manifest_items}
+    </manifest>
+    <spine>
+        <itemref idref="nav"/>
+        {spine_items}
+    </spine>
+</package>
+"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "wb")
+        self.zip = zipfile.ZipFile(self.file, "w")
+        # The mimetype entry must come first and stay uncompressed
+        self.zip.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        self.zip.writestr("META-INF/container.xml", self.CONTAINER_XML, compress_type=zipfile.ZIP_DEFLATED)
+        self.chapters = []
+
+    @property
+    def size(self):
+        """Bytes written to disk so far."""
+        return self.file.tell()
+
+    def add_chapter(self, file_name: str, title: str, xhtml: str):
+        self.zip.writestr(f"OEBPS/{file_name}", xhtml, compress_type=zipfile.ZIP_DEFLATED)
+        self.chapters.append((file_name, title))
+
+    def close(self, title: str, nav_xhtml: str):
+        self.zip.writestr("OEBPS/nav.xhtml", nav_xhtml, compress_type=zipfile.ZIP_DEFLATED)
+        manifest_items = "\n        ".join(
+            f'<item id="chapter{index}" href="{file_name}" media-type="application/xhtml+xml"/>'
+            for index, (file_name, _) in enumerate(self.chapters)
+        )
+        spine_items = "\n        ".join(f'<itemref idref="chapter{index}"/>' for index in range(len(self.chapters)))
+        self.zip.writestr("OEBPS/content.opf", self.PACKAGE_TEMPLATE.format(
+            identifier=uuid.uuid4(),
+            title=html.escape(title),
+            modified=datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            manifest_items=manifest_items,
+            spine_items=spine_items,
+        ), compress_type=zipfile.ZIP_DEFLATED)
+        self.zip.close()
+        self.file.close()
+
+
+class ChapterCache:
+    """Rendered chapter XHTML keyed by page id and last_edited_time, so unchanged articles are not re-rendered."""
+
+    def __init__(self, db_path: str = None):
+        load_dotenv()
+        self.db_path = db_path or os.getenv('QUICKREADER_CACHE_DB', 'chapters.sqlite3')
+        self.conn = sqlite3.connect(self.db_path, timeout=float(os.getenv('SQLITE_BUSY_TIMEOUT', '30')))
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS chapters (
+                page_id TEXT PRIMARY KEY,
+                last_edited_time TEXT NOT NULL,
+                xhtml TEXT NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def get(self, page_id: str, last_edited_time: str):
+        row = self.conn.execute(
+            "SELECT xhtml FROM chapters WHERE page_id = ? AND last_edited_time = ?", (page_id, last_edited_time)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put(self, page_id: str, last_edited_time: str, xhtml: str):
+        # Committed in batches by flush()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO chapters (page_id, last_edited_time, xhtml) VALUES (?, ?, ?)",
+            (page_id, last_edited_time, xhtml)
+        )
+
+    def flush(self):
+        self.conn.commit()
+
+    def discard(self, page_ids: list):
+        """Drop chapters that will not show up in another digest (e.g. pages marked as read)."""
+        with self.conn:
+            self.conn.executemany("DELETE FROM chapters WHERE page_id = ?", [(page_id,) for page_id in page_ids])
+
+
 class QuickReader:
     TOC_TEMPLATE = """
     <nav epub:type="toc" id="toc" role="doc-toc">
@@ -18,12 +134,11 @@ class QuickReader:
     </li>
     """
 
-    DOC_TEMPLATE = """
-    <?xml version='1.0' encoding='utf-8'?>
+    DOC_TEMPLATE = """<?xml version='1.0' encoding='utf-8'?>
     <!DOCTYPE html>
     <html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" epub:prefix="z3998: http://www.daisy.org/z3998/2012/vocab/structure/#" lang="en" xml:lang="en">
-    <head/>
-    <body><h4>{title}</h4>
+    <head><title>{title}</title></head>
+    <body>
         {content}
     </body>
     </html>
@@ -50,84 +165,194 @@ class QuickReader:
         </article>
     """
 
-    def __init__(self, notion):
+    # Room left for the table of contents and package files per article when checking max_bytes
+    PACKAGE_BYTES_PER_ARTICLE = 512
+
+    def __init__(self, notion=None, output_dir: str = None, max_articles: int = None, max_bytes: int = None,
+                 chapter_cache: ChapterCache = None, mark_read: bool = None):
+        """
+        Initialize QuickReader.
+
+        Args:
+            notion: Optional NotionClient used when digest() is called without articles
+            output_dir: Directory for the generated EPUB files (QUICKREADER_DIR)
+            max_articles: Start a new volume after this many articles (QUICKREADER_MAX_ARTICLES, 0 = unlimited)
+            max_bytes: Start a new volume once a file reaches this size (QUICKREADER_MAX_BYTES, 0 = unlimited)
+            chapter_cache: Optional ChapterCache reusing chapters rendered by previous digests
+            mark_read: Mark digested pages as Read in Notion so the next digest only holds new articles
+                (QUICKREADER_MARK_READ, default true, needs a notion client)
+        """
+        load_dotenv()
         self.notion = notion
+        self.chapter_cache = chapter_cache
+        if mark_read is None:
+            mark_read = os.getenv('QUICKREADER_MARK_READ', 'true').lower() in ('1', 'true', 'yes')
+        self.mark_read = mark_read
+        self.output_dir = output_dir or os.getenv('QUICKREADER_DIR', '.')
+        self.max_articles = max_articles if max_articles is not None else int(os.getenv('QUICKREADER_MAX_ARTICLES', '0'))
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv('QUICKREADER_MAX_BYTES', '0'))
         self.toc_items = []
         self.epub = None
+        # Page IDs included in each volume written by the last digest()
+        self.volume_pages = {}
+
+    def render_chapter(self, chapter: dict) -> str:
+        """Render one article as a standalone XHTML document."""
+        title = html.escape(chapter.get("title") or "Untitled")
+        article = self.ARTICLE_TEMPLATE.format(
+            title=title,
+            content=html.escape(chapter.get("abstract") or "").replace("\n", "<br/>"),
+            description=html.escape(chapter.get("description") or ""),
+            tags=html.escape(chapter.get("tag") or ""),
+            created_at=html.escape(chapter.get("date") or ""),
+            url=html.escape(chapter.get("url") or "", quote=True)
+        )
+        return self.DOC_TEMPLATE.format(title=title, content=article)
 
-    def generate_unique_id(self):
-        """Generate a unique identifier for the epub book"""
-        return str(uuid.uuid4())
+    def _chapter_html(self, chapter: dict) -> str:
+        page_id = chapter.get("id")
+        last_edited_time = chapter.get("last_edited_time")
+        if self.chapter_cache is None or not page_id or not last_edited_time:
+            return self.render_chapter(chapter)
+        chapter_html = self.chapter_cache.get(page_id, last_edited_time)
+        if chapter_html is None:
+            chapter_html = self.render_chapter(chapter)
+            self.chapter_cache.put(page_id, last_edited_time, chapter_html)
+        return chapter_html
 
-    def check_ebooklib_installation(self):
-        try:
-            import ebooklib
+    def _volume_path(self, current_date, volume):
+        suffix = "" if volume == 1 else f"_{volume}"
+        return os.path.join(self.output_dir, f"quickreader_{current_date}{suffix}.epub")
+
+    def _volume_full(self, next_chapter: str):
+        """Whether the open volume must be closed before adding the next rendered chapter."""
+        count = len(self.epub.chapters)
+        if count == 0:
+            return False
+        if self.max_articles and count >= self.max_articles:
             return True
-        except ImportError:
-            print("Warning: 'ebooklib' package is not installed!")
-            user_input = input("Would you like to install ebooklib now? (y/n): ")
-            
-            if user_input.lower() == 'y':
-                try:
-                    import subprocess
-                    import sys
-                    
-                    subprocess.check_call([sys.executable, "-m", "pip", "install", "ebooklib"])
-                    print("Successfully installed ebooklib!")
-                    return True
-                except Exception as e:
-                    print(f"Failed to install ebooklib: {str(e)}")
-                    print("Please install it manually using: pip install ebooklib")
-                    return False
-            else:
-                print("Please install ebooklib manually using: pip install ebooklib")
-                return False
-
-    def __init__(self):
-        if (not self.check_ebooklib_installation()):
-            # Handle the case where ebooklib is not available
-            print("Cannot proceed without ebooklib installation")
-
-    def digest(self, news = []):
-        if (self.check_ebooklib_installation()):
-            from ebooklib import epub
-        else:
-            # Handle the case where ebooklib is not available
-            print("Cannot proceed without ebooklib installation")
-            return
+        if not self.max_bytes:
+            return False
+        # Chapters compress, so their raw size is a safe upper bound
+        expected = self.epub.size + len(next_chapter.encode("utf-8")) + (count + 1) * self.PACKAGE_BYTES_PER_ARTICLE
+        return expected > self.max_bytes
 
+    def _close_volume(self, current_date, volume, volumes):
+        nav = self.DOC_TEMPLATE.format(
+            title="Table of Contents",
+            content=self.TOC_TEMPLATE.format(toc_items="".join(self.toc_items))
+        )
+        count = len(self.epub.chapters)
+        title = f"{count} news summarized articles  {current_date}"
+        if volume > 1:
+            title += f" ({volume})"
+        self.epub.close(title, nav)
+        if self.chapter_cache is not None:
+            self.chapter_cache.flush()
+        volumes.append(self.epub.path)
+        logging.info(f"Digest volume written: {self.epub.path} ({count} articles)")
+        self.epub = None
         self.toc_items = []
-        self.epub = epub.EpubBook()
-        self.epub.set_identifier(self.generate_unique_id())
-        current_date = datetime.now().strftime("%Y-%m-%d")
-        self.epub.set_title(f"{len(news)} news summarized articles  {current_date}")
-        self.epub.set_language('en')
 
-        chapter_id = -1
-        for chapter in news:
-            chapter_id += 1
-            chapter_title = chapter["title"]
-
-            chapter_html = self.ARTICLE_TEMPLATE.format(
-                title=chapter_title,
-                content=chapter["abstract"],
-                description=chapter["description"],
-                tags=chapter["tag"],
-                created_at=chapter["date"],
-                url=chapter["url"]
-            )
+    def digest(self, news = None, mark_read: bool = None) -> list:
+        """
+        Stream articles into one or more EPUB volumes.
+
+        Args:
+            news: Iterable of article dicts (title, abstract, description, tag, date, url);
+                  defaults to the notion client's unread summaries
+            mark_read: Override self.mark_read; pass False when the volumes still have to be
+                       delivered and call mark_delivered() afterwards
 
-            epub_chapter = epub.EpubHtml(title=chapter_title, file_name=f"story{chapter_id}.html", lang='en')
-            epub_chapter.content = chapter_html
-            self.epub.add_item(epub_chapter)
+        Returns:
+            Paths of the generated EPUB files
+        """
+        if news is None:
+            if self.notion is None:
+                raise ValueError("No articles given and no Notion client to fetch them from")
+            news = self.notion.iter_news()
+        elif isinstance(news, dict):
+            # database_queue output: articles grouped by date
+            news = (article for articles in news.values() for article in articles)
 
+        current_date = datetime.now().strftime("%Y-%m-%d")
+        volumes = []
+        volume = 0
+        self.epub = None
+        self.toc_items = []
+        self.volume_pages = {}
+        included = []
+        for chapter in news:
+            chapter_html = self._chapter_html(chapter)
+            if self.epub is not None and self._volume_full(chapter_html):
+                self._close_volume(current_date, volume, volumes)
+            if self.epub is None:
+                volume += 1
+                self.epub = EpubWriter(self._volume_path(current_date, volume))
+            chapter_id = len(self.epub.chapters)
+            self.epub.add_chapter(f"story{chapter_id}.html", chapter.get("title") or "", chapter_html)
             self.toc_items.append(self.TOC_ITEM_TEMPLATE.format(
                 index=chapter_id,
-                title=chapter_title,
+                title=html.escape(chapter.get("title") or "Untitled"),
             ))
-        epub_toc = epub.EpubNav()
-        epub_toc.title = "Table of Contents"
-        epub_toc.toc = self.toc_items
-        self.epub.add_item(epub_toc)
+            if chapter.get("id"):
+                included.append(chapter["id"])
+                self.volume_pages.setdefault(self.epub.path, []).append(chapter["id"])
+
+        if self.epub is not None:
+            self._close_volume(current_date, volume, volumes)
+
+        # Written back once the articles iterator is exhausted, never while it is still reading
+        if (self.mark_read if mark_read is None else mark_read):
+            self._mark_pages_read(included)
+        return volumes
+
+    def _mark_pages_read(self, page_ids: list):
+        if self.notion is None or not page_ids:
+            return
+        marked = self.notion.pages_mark_read(page_ids)
+        logging.info(f"Marked {len(marked)}/{len(page_ids)} digested pages as Read")
+        if self.chapter_cache is not None:
+            self.chapter_cache.discard(marked)
+
+    def mark_delivered(self, volumes: list):
+        """Mark the pages of the given volumes (from the last digest) as Read, when mark_read is enabled."""
+        if self.mark_read:
+            self._mark_pages_read([page_id for path in volumes for page_id in self.volume_pages.get(path, [])])
+
+
+def main():
+    from utils.NotionClient import NotionClient
+    from utils.NotionReplica import NotionReplica
+
+    load_dotenv()
+    token = os.getenv('NOTION_TOKEN')
+    database_id = os.getenv('NOTION_DATABASE_ID')
+    if not token or not database_id:
+        logging.error("NOTION_TOKEN and NOTION_DATABASE_ID must be set in your .env file")
+        return 1
+    notion = NotionClient.new(token, database_id, replica=NotionReplica())
+    send = os.getenv('QUICKREADER_SEND', 'false').lower() in ('1', 'true', 'yes')
+    max_bytes = None
+    if send:
+        from utils.Send2Kindle import Send2Kindle
+        # Split volumes so each one fits in a single Kindle e-mail, whatever QUICKREADER_MAX_BYTES says
+        limit = Send2Kindle().max_attachment_bytes
+        max_bytes = min(int(os.getenv('QUICKREADER_MAX_BYTES', '0')) or limit, limit)
+    reader = QuickReader(notion, max_bytes=max_bytes, chapter_cache=ChapterCache())
+    # When sending, pages are only marked Read once the volume holding them was delivered
+    volumes = reader.digest(mark_read=False if send else None)
+    if not volumes:
+        logging.info("No unread summaries to digest")
+        return 0
+    if send:
+        from utils.Send2Kindle import Send2Kindle
+        sent, failed = Send2Kindle().send(volumes)
+        reader.mark_delivered(sent)
+        return 1 if failed else 0
+    return 0
+
 
-        self.book = epub.write_epub(f"quickreader_{current_date}.epub", self.epub, {})
\ No newline at end of file
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    sys.exit(main())
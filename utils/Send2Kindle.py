@@ -1,49 +1,228 @@
 import os
+import sys
+import time
+import uuid
+import base64
+import logging
 import smtplib
-from email import encoders
+import mimetypes
 from email.header import Header
-from email.mime.text import MIMEText
-from email.utils import parseaddr, formataddr
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
+from email.utils import parseaddr, formataddr, formatdate, make_msgid
+from dotenv import load_dotenv
 
 #A simple Python script that sends the selected EPUB files to a designated
-#basename = os.path.basename(selected_file)
+#Kindle address, reusing one SMTP connection for the whole batch.
 
 class Send2Kindle:
+    # Amazon's Send to Kindle limit for a whole e-mail, attachments included
+    KINDLE_MAX_BYTES = 50 * 1024 * 1024
+    # Multiple of 57 raw bytes so every base64 chunk ends on a full 76-character line
+    CHUNK_BYTES = 57 * 1024
+    # Headers, text part and MIME boundaries of one message
+    MESSAGE_OVERHEAD_BYTES = 4096
+    TRANSIENT_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
     def __init__(self):
-        # SMTP_SERVER, EMAIL_ADDRESS, EMAIL_PASSWD and 
+        # SMTP_SERVER, EMAIL_ADDRESS, EMAIL_PASSWD and
         # KINDLE_EMAIL_ADDRESS need to be filled out before deployment.
+        load_dotenv()
         self.kindle_email = os.getenv('KINDLE_EMAIL_ADDRESS')
         self.smtp_server = os.getenv('SMTP_SERVER')
+        self.smtp_port = int(os.getenv('SMTP_PORT', '587'))
+        self.starttls = os.getenv('SMTP_STARTTLS', 'true').lower() in ('1', 'true', 'yes')
         self.email_address = os.getenv('EMAIL_ADDRESS')
         self.password = os.getenv('EMAIL_PASSWD')
-        pass
-
-    def send(self):
-        smtp_obj = smtplib.SMTP(self.smtp_server, 587)
-        smtp_obj.starttls()
-        smtp_obj.login(self.email_address, self.password)
-        to_addr = self.kindle_email
-
-        def _format_addr(s):
-            name, addr = parseaddr(s)
-            return formataddr((Header(name, 'utf-8').encode(), addr))
-
-        msg = MIMEMultipart()
-        msg['From'] = _format_addr(smtp_obj.user)
-        msg['To'] = _format_addr(to_addr)
-        msg['Subject'] = Header('Sent to Kindle', 'utf-8').encode()
-        msg.attach(
-            MIMEText('A Voyage to Kindle Powered by Python.', 'plain', 'utf-8'))
-        with open(  sys.argv[1], 'rb') as f:
-            mime = MIMEBase('document', 'mobi', filename=basename)
-            mime.add_header('Content-Disposition',
-                            'attachment', filename=basename)
-            mime.add_header('Content-ID', '<0>')
-            mime.add_header('X-Attachment-Id', '0')
-            mime.set_payload(f.read())
-            encoders.encode_base64(mime)
-            msg.attach(mime)
-
-        smtp_obj.sendmail(smtp_obj.user, to_addr, msg.as_string())
+        self.max_bytes = int(os.getenv('KINDLE_MAX_BYTES', str(self.KINDLE_MAX_BYTES)))
+        # Always at least one attempt, otherwise batches would end up neither sent nor failed
+        self.retries = max(1, int(os.getenv('SMTP_RETRIES', '3')))
+        self.retry_delay = float(os.getenv('SMTP_RETRY_DELAY', '5'))
+        self.smtp_obj = None
+
+    @property
+    def max_attachment_bytes(self):
+        """Largest file that fits in one message once base64-encoded (QuickReader volumes should stay below it)."""
+        available = self.max_bytes - self.MESSAGE_OVERHEAD_BYTES
+        # Invert encoded_length (78 bytes per 76-character line), then settle on the exact boundary
+        size = max(available * 76 // 78 * 3 // 4, 0)
+        while size > 0 and self.encoded_length(size) > available:
+            size -= 1
+        while self.encoded_length(size + 1) <= available:
+            size += 1
+        return size
+
+    @staticmethod
+    def encoded_length(size):
+        # base64 output plus CRLF every 76 characters
+        encoded = (size + 2) // 3 * 4
+        return encoded + (encoded + 75) // 76 * 2
+
+    @classmethod
+    def encoded_size(cls, path):
+        return cls.encoded_length(os.path.getsize(path))
+
+    def plan_batches(self, files):
+        """
+        Group files into messages that stay under the Kindle mail limit.
+
+        Returns:
+            Tuple of the list of batches and the files too large to send
+        """
+        batches = []
+        oversized = []
+        current = []
+        current_size = self.MESSAGE_OVERHEAD_BYTES
+        for path in files:
+            size = self.encoded_size(path) + self.MESSAGE_OVERHEAD_BYTES
+            if size > self.max_bytes:
+                oversized.append(path)
+                continue
+            if current and current_size + size > self.max_bytes:
+                batches.append(current)
+                current = []
+                current_size = self.MESSAGE_OVERHEAD_BYTES
+            current.append(path)
+            current_size += size
+        if current:
+            batches.append(current)
+        return batches, oversized
+
+    def connect(self):
+        self.close()
+        smtp_obj = smtplib.SMTP(self.smtp_server, self.smtp_port)
+        if self.starttls:
+            smtp_obj.starttls()
+        if self.password:
+            smtp_obj.login(self.email_address, self.password)
+        self.smtp_obj = smtp_obj
+        return smtp_obj
+
+    def close(self):
+        if self.smtp_obj is not None:
+            try:
+                self.smtp_obj.quit()
+            except smtplib.SMTPException:
+                pass
+            except OSError:
+                pass
+            self.smtp_obj = None
+
+    @staticmethod
+    def _format_addr(s):
+        name, addr = parseaddr(s)
+        return formataddr((Header(name, 'utf-8').encode(), addr))
+
+    def _write_message(self, files):
+        """Stream one multipart message through an open DATA command, base64-encoding attachments chunk by chunk."""
+        boundary = f"=={uuid.uuid4().hex}=="
+        headers = [
+            f"From: {self._format_addr(self.email_address)}",
+            f"To: {self._format_addr(self.kindle_email)}",
+            f"Subject: {Header('Sent to Kindle', 'utf-8').encode()}",
+            f"Date: {formatdate(localtime=True)}",
+            f"Message-ID: {make_msgid()}",
+            "MIME-Version: 1.0",
+            f'Content-Type: multipart/mixed; boundary="{boundary}"',
+            "",
+            f"--{boundary}",
+            'Content-Type: text/plain; charset="utf-8"',
+            "Content-Transfer-Encoding: 7bit",
+            "",
+            "A Voyage to Kindle Powered by Python.",
+        ]
+        self.smtp_obj.send(("\r\n".join(headers) + "\r\n").encode("utf-8"))
+
+        for index, path in enumerate(files):
+            basename = os.path.basename(path)
+            filename = basename if basename.isascii() else Header(basename, 'utf-8').encode()
+            content_type = mimetypes.guess_type(basename)[0] or "application/octet-stream"
+            part_headers = [
+                f"--{boundary}",
+                f'Content-Type: {content_type}; name="{filename}"',
+                "Content-Transfer-Encoding: base64",
+                f'Content-Disposition: attachment; filename="{filename}"',
+                f"Content-ID: <{index}>",
+                f"X-Attachment-Id: {index}",
+                "",
+            ]
+            self.smtp_obj.send(("\r\n".join(part_headers) + "\r\n").encode("utf-8"))
+            # base64 lines never start with ".", so no dot-stuffing is needed
+            with open(path, "rb") as f:
+                while chunk := f.read(self.CHUNK_BYTES):
+                    self.smtp_obj.send(base64.encodebytes(chunk).replace(b"\n", b"\r\n"))
+        self.smtp_obj.send(f"--{boundary}--\r\n.\r\n".encode("utf-8"))
+
+    def _send_batch(self, files):
+        if self.smtp_obj is None:
+            self.connect()
+        smtp_obj = self.smtp_obj
+        smtp_obj.ehlo_or_helo_if_needed()
+        code, response = smtp_obj.mail(self.email_address)
+        if code != 250:
+            smtp_obj.rset()
+            raise smtplib.SMTPSenderRefused(code, response, self.email_address)
+        code, response = smtp_obj.rcpt(self.kindle_email)
+        if code not in (250, 251):
+            smtp_obj.rset()
+            raise smtplib.SMTPRecipientsRefused({self.kindle_email: (code, response)})
+        code, response = smtp_obj.docmd("DATA")
+        if code != 354:
+            raise smtplib.SMTPDataError(code, response)
+        self._write_message(files)
+        code, response = smtp_obj.getreply()
+        if code != 250:
+            raise smtplib.SMTPDataError(code, response)
+
+    def _is_transient(self, error):
+        if isinstance(error, self.TRANSIENT_ERRORS):
+            return True
+        # 4xx replies are temporary failures per RFC 5321
+        return isinstance(error, smtplib.SMTPResponseException) and 400 <= error.smtp_code < 500
+
+    def send(self, files):
+        """
+        Deliver files to the Kindle address over a single SMTP connection.
+
+        Args:
+            files: Path or list of paths of the documents to send
+
+        Returns:
+            Tuple of the files delivered and the files that could not be delivered
+        """
+        if isinstance(files, (str, os.PathLike)):
+            files = [files]
+        batches, oversized = self.plan_batches(files)
+        for path in oversized:
+            logging.error(f"{path} exceeds the Kindle mail limit of {self.max_bytes} bytes, "
+                          f"build smaller digest volumes (QUICKREADER_MAX_BYTES <= {self.max_attachment_bytes})")
+        sent = []
+        failed = list(oversized)
+        try:
+            for batch in batches:
+                for attempt in range(self.retries):
+                    try:
+                        self._send_batch(batch)
+                        sent.extend(batch)
+                        logging.info(f"Sent to Kindle: {', '.join(os.path.basename(path) for path in batch)}")
+                        break
+                    except Exception as e:
+                        if not self._is_transient(e) or attempt == self.retries - 1:
+                            logging.error(f"Failed to send {batch} to Kindle: {e}")
+                            failed.extend(batch)
+                            self.close()
+                            break
+                        logging.warning(f"Attempt {attempt + 1}/{self.retries} to send {batch} failed: {e}")
+                        # The connection state is unknown after a transient failure, start over
+                        self.close()
+                        time.sleep(self.retry_delay * (attempt + 1))
+        finally:
+            self.close()
+        return sent, failed
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    if len(sys.argv) < 2:
+        print("Usage: python -m utils.Send2Kindle <file> [<file> ...]")
+        sys.exit(2)
+    _, failed = Send2Kindle().send(sys.argv[1:])
+    sys.exit(1 if failed else 0)
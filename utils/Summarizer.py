@@ -1,26 +1,10 @@
 import os
 from typing import Optional
 from dotenv import load_dotenv
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_core.prompts import ChatPromptTemplate
-from langchain.docstore.document import Document
+from utils.LLMProvider import get_llm
 
 load_dotenv()
 
-SUPPORTED_LLMS = {'ollama', 'openai', 'azure_openai'}
-LLM = os.getenv('LLM', 'ollama')
-
-if LLM not in SUPPORTED_LLMS:
-    raise ValueError(f"Unsupported LLM type. Must be one of {SUPPORTED_LLMS}")
-
-# Import based on LLM type
-if (LLM == 'ollama'):
-    from langchain_ollama.llms import OllamaLLM
-elif (LLM == 'openai'):
-    from langchain_openai import ChatOpenAI
-elif (LLM == 'azure_openai'):
-    from langchain_openai import AzureChatOpenAI
-
 class TextSummarizer:
     def __init__(self):
         self.model_name = os.getenv("LLM_MODEL")
@@ -29,22 +13,16 @@ class TextSummarizer:
         
         # Initialize LLM with error handling
         try:
-            if (LLM == 'ollama'):
-                self.llm = OllamaLLM(model=self.model_name)
-            elif (LLM == 'openai'):
-                api_key = os.getenv("LLM_APIKEY")
-                if not api_key:
-                    raise ValueError("API key not found in environment variables")
-                self.llm = ChatOpenAI(model=self.model_name, api_key=api_key)
-            elif (LLM == 'azure_openai'):
-                api_key = os.getenv("LLM_APIKEY")
-                if not api_key:
-                    raise ValueError("API key not found in environment variables")
-                self.llm = AzureChatOpenAI(model=self.model_name, api_key=api_key)
+            self.llm = get_llm(self.model_name)
         except Exception as e:
             raise RuntimeError(f"Failed to initialize LLM: {str(e)}")
+
+        # Record the tokens of every call for TokenBudget
+        from utils.TokenCounter import TokenCounter
+        self.token_counter = TokenCounter("summary", self.model_name)
         
         # Define default prompt template
+        from langchain_core.prompts import ChatPromptTemplate
         self.prompt = ChatPromptTemplate.from_messages([
             ("system", "You are an academic research expert. \n"
             "Produce a concise and clear summary that encapsulates the main findings, questions, evidences, methodology, results, and implications of the study. \n"
@@ -61,6 +39,8 @@ class TextSummarizer:
             raise ValueError("Input text cannot be empty")
         
         try:
+            from langchain.chains.combine_documents import create_stuff_documents_chain
+            from langchain.docstore.document import Document
             # Split text into chunks and create Document objects
             text_chunks = text_string.split(" \n ")
             docs = [Document(page_content=chunk) for chunk in text_chunks if chunk.strip()]
@@ -70,7 +50,7 @@ class TextSummarizer:
             
             # Create and invoke chain
             chain = create_stuff_documents_chain(self.llm, self.prompt)
-            result = chain.invoke({"context": docs})
+            result = chain.invoke({"context": docs}, config={"callbacks": [self.token_counter]})
             return result
         except Exception as e:
             raise RuntimeError(f"Error during text summarization: {str(e)}")
\ No newline at end of file
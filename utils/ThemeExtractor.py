@@ -1,19 +1,11 @@
 import os
-import re
+import json
 from dotenv import load_dotenv
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_core.prompts import ChatPromptTemplate
-from langchain.docstore.document import Document
+from utils.CpuPool import CpuPool
+from utils.LLMProvider import get_llm
+from utils.Parsers import parse_theme_bytes
 
 load_dotenv()
-LLM = os.getenv('LLM', 'ollama') 
-
-if (LLM == 'ollama'):
-    from langchain_ollama.llms import OllamaLLM
-elif (LLM == 'openai'):
-    from langchain_openai import ChatOpenAI
-elif (LLM == 'azure_openai'):
-    from langchain_openai import AzureChatOpenAI
 
 class ThemeExtractor:
     MAX_THEME_LENGTH = 1981
@@ -26,22 +18,16 @@ class ThemeExtractor:
         
         # Initialize LLM with error handling
         try:
-            if (LLM == 'ollama'):
-                self.llm = OllamaLLM(model=self.model_name)
-            elif (LLM == 'openai'):
-                api_key = os.getenv("LLM_APIKEY")
-                if not api_key:
-                    raise ValueError("API key not found in environment variables")
-                self.llm = ChatOpenAI(model=self.model_name, api_key=api_key)
-            elif (LLM == 'azure_openai'):
-                api_key = os.getenv("LLM_APIKEY")
-                if not api_key:
-                    raise ValueError("API key not found in environment variables")
-                self.llm = AzureChatOpenAI(model=self.model_name, api_key=api_key)
+            self.llm = get_llm(self.model_name)
         except Exception as e:
             raise RuntimeError(f"Failed to initialize LLM: {str(e)}")
+
+        # Record the tokens of every call for TokenBudget
+        from utils.TokenCounter import TokenCounter
+        self.token_counter = TokenCounter("theme", self.model_name)
         
         # Define theme extraction prompt template
+        from langchain_core.prompts import ChatPromptTemplate
         self.prompt = ChatPromptTemplate.from_messages([
             ("system", "**You are a text analysis expert.**   \n"
             "Analyze the given text and determine its main theme with a focus on factual content.  \n"
@@ -67,51 +53,14 @@ class ThemeExtractor:
         ])
         
     def extract_themes(self, text_string):
+        from langchain.chains.combine_documents import create_stuff_documents_chain
+        from langchain.docstore.document import Document
         # Split text into chunks and create Document objects
         text_chunks = text_string.split(" \n ")
         docs = [Document(page_content=chunk) for chunk in text_chunks if chunk.strip()]
         
         # Create and invoke chain
         chain = create_stuff_documents_chain(self.llm, self.prompt)
-        result = chain.invoke({"context": docs})
-        # Split result into theme and keywords sections
-        theme_section = ""
-        keywords = []
-        
-        # Extract theme and keywords using regex
-        match = re.search("\\*\\*Main Theme:\\*\\*(.*?)\\*\\*Keywords:\\*\\*(.*)", result, re.DOTALL)
-        
-        if match:
-            theme_section = match.group(1).strip()
-            keywords_text = match.group(2).strip()
-            # Split keywords by comma, newline or bullet points
-            raw_keywords = [k.strip('- ') for k in re.split(r',|\n|- ', keywords_text) if k.strip('- ')]
-
-            # Clean up each keyword
-            for keyword in raw_keywords:
-                # Remove common patterns and clean up
-                cleaned = keyword.strip()
-                # Remove numbering (e.g., "1. ", "2. ")
-                cleaned = re.sub(r'^\d+\.\s*', '', cleaned)
-                # Remove asterisks
-                cleaned = re.sub(r'\*+', '', cleaned)
-                cleaned = re.sub(r'^\*\s*', '', cleaned)
-                # Remove dashes at start
-                cleaned = re.sub(r'^-\s*', '', cleaned)
-                # Remove any remaining leading/trailing whitespace
-                cleaned = cleaned.strip()
-                # Convert to lowercase
-                cleaned = cleaned.lower()
-                
-                if cleaned:  # Only add non-empty keywords
-                    keywords.append(cleaned)
-        else:
-            # Fallback if pattern not found
-            theme_section = result
-            keywords = []
-
-        
-        return {
-            "theme": theme_section[:self.MAX_THEME_LENGTH],
-            "keywords": keywords
-        }
\ No newline at end of file
+        result = chain.invoke({"context": docs}, config={"callbacks": [self.token_counter]})
+        # Regex cleanup runs in the process pool when one is configured and the output is large
+        return json.loads(CpuPool.run(parse_theme_bytes, json.dumps([result, self.MAX_THEME_LENGTH]).encode("utf-8")))
\ No newline at end of file
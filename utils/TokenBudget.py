@@ -0,0 +1,288 @@
+import os
+import sys
+import json
+import time
+import logging
+import sqlite3
+import argparse
+import threading
+from datetime import datetime, date, timedelta
+from dotenv import load_dotenv
+from litequeue import LiteQueue
+
+# TokenUsage records the prompt/completion tokens of every LLM call per day, and
+# TokenBudget paces the queue against it: tasks wait for room under the
+# tokens-per-minute limit instead of hitting provider 429s, the queue stops when the
+# daily budget is spent, and long articles are parked in a "Deferred" queue until
+# off-peak hours.
+
+WINDOW_SECONDS = 60
+
+
+class TokenUsage:
+    def __init__(self, db_path: str = None):
+        """
+        Initialize TokenUsage.
+
+        Args:
+            db_path: Path of the SQLite file holding the usage counters (TOKEN_USAGE_DB)
+        """
+        load_dotenv()
+        self.db_path = db_path or os.getenv('TOKEN_USAGE_DB', 'tokens.sqlite3')
+        # Theme and summary record from their own threads
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, timeout=float(os.getenv('SQLITE_BUSY_TIMEOUT', '30')),
+                                    isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS daily_usage (
+                day TEXT NOT NULL,
+                component TEXT NOT NULL,
+                model TEXT NOT NULL,
+                calls INTEGER NOT NULL DEFAULT 0,
+                prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                completion_tokens INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, component, model)
+            );
+            CREATE TABLE IF NOT EXISTS token_window (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                at REAL NOT NULL,
+                tokens INTEGER NOT NULL,
+                reserved INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_token_window_at ON token_window (at);
+        """)
+
+    def close(self):
+        self.conn.close()
+
+    def record(self, component: str, model: str, prompt_tokens: int, completion_tokens: int):
+        """Add one LLM call to today's totals and to the rolling per-minute window."""
+        now = time.time()
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute(
+                    "INSERT INTO daily_usage (day, component, model, calls, prompt_tokens, completion_tokens) "
+                    "VALUES (?, ?, ?, 1, ?, ?) ON CONFLICT(day, component, model) DO UPDATE SET "
+                    "calls = calls + 1, prompt_tokens = prompt_tokens + excluded.prompt_tokens, "
+                    "completion_tokens = completion_tokens + excluded.completion_tokens",
+                    (date.today().isoformat(), component, model or "", prompt_tokens, completion_tokens)
+                )
+                self.conn.execute("INSERT INTO token_window (at, tokens) VALUES (?, ?)",
+                                  (now, prompt_tokens + completion_tokens))
+                self.conn.execute("DELETE FROM token_window WHERE at < ?", (now - 3600,))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def used_today(self) -> int:
+        row = self.conn.execute(
+            "SELECT COALESCE(SUM(prompt_tokens + completion_tokens), 0) FROM daily_usage WHERE day = ?",
+            (date.today().isoformat(),)
+        ).fetchone()
+        return row[0]
+
+    def used_in_window(self, now: float = None) -> int:
+        """Tokens used or reserved during the last minute, across every process."""
+        now = now or time.time()
+        row = self.conn.execute(
+            "SELECT COALESCE(SUM(tokens), 0) FROM token_window WHERE at >= ?", (now - WINDOW_SECONDS,)
+        ).fetchone()
+        return row[0]
+
+    def try_reserve(self, tokens: int, limit: int):
+        """Reserve tokens in the current minute if they fit under limit; returns the reservation ID or None."""
+        now = time.time()
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                used = self.used_in_window(now)
+                # A task larger than the whole limit still runs once the window is empty
+                if used > 0 and used + tokens > limit:
+                    self.conn.execute("COMMIT")
+                    return None
+                reservation = self.conn.execute(
+                    "INSERT INTO token_window (at, tokens, reserved) VALUES (?, ?, 1)", (now, tokens)
+                ).lastrowid
+                self.conn.execute("COMMIT")
+                return reservation
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def release(self, reservation: int):
+        """Drop a reservation once the calls it covered have recorded their actual usage."""
+        with self._lock:
+            self.conn.execute("DELETE FROM token_window WHERE id = ? AND reserved = 1", (reservation,))
+
+    def report(self, days: int = 7) -> list:
+        since = (date.today() - timedelta(days=days - 1)).isoformat()
+        return self.conn.execute(
+            "SELECT day, component, model, calls, prompt_tokens, completion_tokens FROM daily_usage "
+            "WHERE day >= ? ORDER BY day, component, model", (since,)
+        ).fetchall()
+
+
+class TokenBudget:
+    DEFERRED_QUEUE = "Deferred"
+    _warned_offpeak = False
+
+    def __init__(self, usage: TokenUsage = None):
+        """
+        Initialize TokenBudget. Every limit defaults to 0, meaning unlimited.
+
+        Args:
+            usage: Optional TokenUsage instance, defaults to TokenUsage()
+        """
+        load_dotenv()
+        self.usage = usage or TokenUsage()
+        self.tpm_limit = int(os.getenv('LLM_TPM_LIMIT', '0'))
+        self.daily_budget = int(os.getenv('LLM_DAILY_TOKEN_BUDGET', '0'))
+        self.long_article_tokens = int(os.getenv('LLM_LONG_ARTICLE_TOKENS', '0'))
+        self.offpeak_hours = self._parse_hours(os.getenv('LLM_OFFPEAK_HOURS', ''))
+        self.chars_per_token = float(os.getenv('LLM_CHARS_PER_TOKEN', '4'))
+        self.completion_tokens = int(os.getenv('LLM_COMPLETION_TOKENS', '500'))
+        self.max_wait = float(os.getenv('LLM_TPM_MAX_WAIT', '300'))
+        if self.long_article_tokens and self.offpeak_hours is None and not TokenBudget._warned_offpeak:
+            # Without off-peak hours every hour counts as off-peak, so nothing would be deferred
+            logging.warning("LLM_LONG_ARTICLE_TOKENS is set but LLM_OFFPEAK_HOURS is not, long articles will not be deferred")
+            TokenBudget._warned_offpeak = True
+
+    @staticmethod
+    def _parse_hours(value: str):
+        """Parse "22-6" into (22, 6), the off-peak hours in local time; empty disables off-peak deferral."""
+        if not value.strip():
+            return None
+        try:
+            start, end = (int(hour) % 24 for hour in value.split("-"))
+        except ValueError:
+            raise ValueError("LLM_OFFPEAK_HOURS must look like 22-6")
+        return start, end
+
+    def estimate(self, content: str, calls: int = 2) -> int:
+        """Tokens a task will use: the content goes through both the theme and the summary chain."""
+        prompt_tokens = int(len(content or "") / self.chars_per_token) + 300
+        return calls * (prompt_tokens + self.completion_tokens)
+
+    def is_offpeak(self, now: datetime = None) -> bool:
+        """Whether now falls in LLM_OFFPEAK_HOURS; always True when they are not set."""
+        if self.offpeak_hours is None:
+            return True
+        hour = (now or datetime.now()).hour
+        start, end = self.offpeak_hours
+        return start <= hour < end if start <= end else hour >= start or hour < end
+
+    def remaining_today(self):
+        if not self.daily_budget:
+            return None
+        return self.daily_budget - self.usage.used_today()
+
+    def has_capacity(self) -> bool:
+        """Cheap check before popping a task: today's budget is not spent and the last minute is not full."""
+        remaining = self.remaining_today()
+        if remaining is not None and remaining <= 0:
+            return False
+        return not self.tpm_limit or self.usage.used_in_window() < self.tpm_limit
+
+    def can_ever_fit(self, estimate: int) -> bool:
+        """False when a task needs more than the whole daily budget, so deferring it would loop forever."""
+        return not self.daily_budget or estimate <= self.daily_budget
+
+    def defer_reason(self, estimate: int):
+        """Return why a task should wait in the Deferred queue, or None when it can run now."""
+        remaining = self.remaining_today()
+        if remaining is not None and estimate > remaining:
+            return f"needs ~{estimate} tokens, {max(remaining, 0)} left in today's budget"
+        if self.long_article_tokens and estimate > self.long_article_tokens and not self.is_offpeak():
+            return f"long article (~{estimate} tokens), waiting for off-peak hours"
+        return None
+
+    def reserve(self, estimate: int):
+        """
+        Block until the estimate fits under LLM_TPM_LIMIT, then reserve it.
+
+        Returns the reservation ID (None when there is no limit); release it once the task's calls are done.
+        """
+        if not self.tpm_limit:
+            return None
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            reservation = self.usage.try_reserve(estimate, self.tpm_limit)
+            if reservation is not None or time.monotonic() >= deadline:
+                if reservation is None:
+                    logging.warning(f"Waited {self.max_wait:.0f}s for ~{estimate} tokens under the TPM limit, running anyway")
+                return reservation
+            logging.info(f"Token rate limit reached, waiting for room for ~{estimate} tokens")
+            time.sleep(5)
+
+    def release(self, reservation):
+        if reservation is not None:
+            self.usage.release(reservation)
+
+    def deferred_queue(self, queue: LiteQueue) -> LiteQueue:
+        """The Deferred queue lives next to the task queue, in the same SQLite file."""
+        return LiteQueue(queue.conn, queue_name=self.DEFERRED_QUEUE)
+
+    def defer(self, queue: LiteQueue, task_id: str, data: str, estimate: int):
+        """Park a popped task, with its token estimate, in the Deferred queue and close it in the task queue."""
+        payload = json.loads(data)
+        payload["estimate_tokens"] = estimate
+        self.deferred_queue(queue).put(json.dumps(payload))
+        queue.done(task_id)
+
+    def release_deferred(self, queue: LiteQueue) -> int:
+        """
+        Move deferred tasks back to the task queue during off-peak hours, as many as fit in today's remaining budget.
+
+        Tasks that no longer fit the whole daily budget (e.g. after it was lowered) are marked failed.
+        """
+        remaining = self.remaining_today()
+        if not self.is_offpeak() or (remaining is not None and remaining <= 0):
+            return 0
+        deferred = self.deferred_queue(queue)
+        messages = []
+        while True:
+            message = deferred.pop()
+            if message is None:
+                break
+            messages.append(message)
+
+        released = 0
+        for message in messages:
+            payload = json.loads(message.data)
+            estimate = payload.pop("estimate_tokens", 0)
+            if not self.can_ever_fit(estimate):
+                logging.error(f"Deferred page {payload.get('id')} needs ~{estimate} tokens, more than the whole "
+                              f"daily budget of {self.daily_budget}, marking it failed")
+                deferred.mark_failed(message.message_id)
+            elif remaining is None or estimate <= remaining:
+                queue.put(json.dumps(payload))
+                deferred.done(message.message_id)
+                released += 1
+                if remaining is not None:
+                    remaining -= estimate
+            else:
+                # Waits for another day's budget
+                deferred.retry(message.message_id)
+        if released:
+            deferred.prune(False)
+            logging.info(f"Released {released} deferred tasks")
+        return released
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show LLM token usage per day")
+    parser.add_argument("--days", type=int, default=7, help="number of days to show")
+    args = parser.parse_args(argv)
+
+    usage = TokenUsage()
+    print(f"{'day':<12}{'component':<16}{'model':<24}{'calls':>7}{'prompt':>12}{'completion':>12}")
+    for day, component, model, calls, prompt_tokens, completion_tokens in usage.report(args.days):
+        print(f"{day:<12}{component:<16}{model[:23]:<24}{calls:>7}{prompt_tokens:>12}{completion_tokens:>12}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+import logging
+from langchain_core.callbacks import BaseCallbackHandler
+from utils.TokenBudget import TokenUsage
+
+# Imported lazily by TextSummarizer and ThemeExtractor (it needs langchain_core).
+
+
+class TokenCounter(BaseCallbackHandler):
+    """LangChain callback recording the prompt/completion tokens of every LLM call."""
+
+    def __init__(self, component: str, model: str, usage: TokenUsage = None):
+        """
+        Initialize TokenCounter.
+
+        Args:
+            component: Name the usage is recorded under (e.g. "summary", "theme")
+            model: Model name, recorded with the usage
+            usage: Optional TokenUsage instance, defaults to TokenUsage()
+        """
+        self.component = component
+        self.model = model
+        self.usage = usage or TokenUsage()
+        self.prompt_chars = 0
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.prompt_chars = sum(len(prompt) for prompt in prompts)
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.prompt_chars = sum(len(str(message.content)) for batch in messages for message in batch)
+
+    @staticmethod
+    def _reported_usage(response):
+        """Token counts reported by the provider, or None when it reported none."""
+        token_usage = (response.llm_output or {}).get("token_usage") or {}
+        if "prompt_tokens" in token_usage:
+            # OpenAI / Azure OpenAI
+            return token_usage["prompt_tokens"], token_usage.get("completion_tokens", 0)
+
+        prompt_tokens = completion_tokens = 0
+        found = False
+        for generations in response.generations:
+            for generation in generations:
+                usage_metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                info = generation.generation_info or {}
+                if usage_metadata:
+                    prompt_tokens += usage_metadata.get("input_tokens", 0)
+                    completion_tokens += usage_metadata.get("output_tokens", 0)
+                    found = True
+                elif "prompt_eval_count" in info or "eval_count" in info:
+                    # Ollama
+                    prompt_tokens += info.get("prompt_eval_count") or 0
+                    completion_tokens += info.get("eval_count") or 0
+                    found = True
+        return (prompt_tokens, completion_tokens) if found else None
+
+    def on_llm_end(self, response, **kwargs):
+        reported = self._reported_usage(response)
+        if reported is None:
+            # Provider reported nothing, fall back to ~4 characters per token
+            completion_chars = sum(len(generation.text) for generations in response.generations for generation in generations)
+            reported = (self.prompt_chars // 4, completion_chars // 4)
+        try:
+            self.usage.record(self.component, self.model, *reported)
+        except Exception as e:
+            logging.warning(f"Failed to record token usage for {self.component}: {e}")
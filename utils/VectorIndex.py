@@ -0,0 +1,345 @@
+import os
+import re
+import sys
+import json
+import hashlib
+import logging
+import argparse
+import contextlib
+import numpy as np
+from dotenv import load_dotenv
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are not serialized across processes
+    fcntl = None
+
+# VectorIndex keeps one embedding per processed article (theme + summary) in a flat,
+# memory-mapped float32 file with an append-only ID map, so related articles can be
+# found locally in milliseconds instead of going through Notion's keyword search.
+
+
+class HashingEmbedder:
+    """Offline embedder: hashed word unigrams and bigrams projected into a fixed-size vector."""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text):
+        words = re.findall(r"\w+", text.lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts: list) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+                sign = 1.0 if digest & 1 else -1.0
+                vectors[row, (digest >> 1) % self.dim] += sign
+        return vectors
+
+
+class OllamaEmbedder:
+    """Local embedding model served by Ollama."""
+
+    def __init__(self, model_name: str):
+        from langchain_ollama import OllamaEmbeddings
+        self.model = OllamaEmbeddings(model=model_name)
+        self.name = f"ollama-{model_name}"
+
+    def embed(self, texts: list) -> np.ndarray:
+        return np.asarray(self.model.embed_documents(texts), dtype=np.float32)
+
+
+def get_embedder():
+    """Pick the embedder from EMBEDDINGS (hashing | ollama) and EMBEDDING_MODEL."""
+    load_dotenv()
+    provider = os.getenv('EMBEDDINGS', 'hashing')
+    if provider == 'hashing':
+        return HashingEmbedder(int(os.getenv('EMBEDDING_DIM', '384')))
+    if provider == 'ollama':
+        model_name = os.getenv('EMBEDDING_MODEL')
+        if not model_name:
+            raise ValueError("EMBEDDING_MODEL environment variable is required for ollama embeddings")
+        return OllamaEmbedder(model_name)
+    raise ValueError("Unsupported EMBEDDINGS type. Must be one of {'hashing', 'ollama'}")
+
+
+class VectorIndex:
+    VECTORS_FILE = "vectors.f32"
+    CODES_FILE = "codes.u8"
+    IDS_FILE = "ids.jsonl"
+    META_FILE = "meta.json"
+    LOCK_FILE = "index.lock"
+    CODE_BITS = 256
+    SCAN_ROWS = 65536
+    # Rows are scanned exactly below this size; above it the sign-bit codes pre-select candidates
+    APPROXIMATE_MIN_ROWS = 50000
+    CANDIDATES_PER_RESULT = 32
+
+    def __init__(self, path: str = None, embedder=None):
+        """
+        Initialize VectorIndex.
+
+        Args:
+            path: Directory holding the index files (VECTOR_INDEX_DIR)
+            embedder: Optional embedder instance, defaults to get_embedder()
+        """
+        load_dotenv()
+        self.path = path or os.getenv('VECTOR_INDEX_DIR', 'vectors')
+        self.embedder = embedder or get_embedder()
+        os.makedirs(self.path, exist_ok=True)
+
+        meta_path = os.path.join(self.path, self.META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.meta = json.load(f)
+            if self.meta["model"] != self.embedder.name:
+                raise ValueError(f"Vector index was built with {self.meta['model']}, not {self.embedder.name}")
+        else:
+            self.meta = {"model": self.embedder.name, "dim": None}
+
+        self.ids = []
+        self.rows = {}
+        self.metadata = {}
+        self._ids_offset = 0
+        self._vectors = None
+        self._codes = None
+        self._refresh()
+
+    def _refresh(self):
+        """Load ID map entries appended since the last read, e.g. by another worker process."""
+        ids_path = os.path.join(self.path, self.IDS_FILE)
+        if not os.path.exists(ids_path):
+            return
+        with open(ids_path) as f:
+            f.seek(self._ids_offset)
+            for line in iter(f.readline, ""):
+                if not line.endswith("\n"):
+                    # Entry still being written
+                    break
+                if line.strip():
+                    self._register(json.loads(line))
+                self._ids_offset = f.tell()
+        self._vectors = None
+        self._codes = None
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Serialize appends across processes so the vector, code and ID files stay aligned."""
+        with open(os.path.join(self.path, self.LOCK_FILE), "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _register(self, entry):
+        # Re-indexed pages append a new row; the latest row wins
+        self.rows[entry["id"]] = len(self.ids)
+        self.metadata[entry["id"]] = entry
+        self.ids.append(entry["id"])
+
+    @property
+    def dim(self):
+        return self.meta["dim"]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _hyperplanes(self):
+        generator = np.random.default_rng(0)
+        return generator.standard_normal((self.dim, self.CODE_BITS)).astype(np.float32)
+
+    def _encode(self, vectors):
+        return np.packbits(vectors @ self._hyperplanes() > 0, axis=1)
+
+    def _map(self):
+        if self._vectors is None and self.ids:
+            self._vectors = np.memmap(os.path.join(self.path, self.VECTORS_FILE), dtype=np.float32,
+                                      mode="r", shape=(len(self.ids), self.dim))
+            self._codes = np.memmap(os.path.join(self.path, self.CODES_FILE), dtype=np.uint8,
+                                    mode="r", shape=(len(self.ids), self.CODE_BITS // 8))
+        return self._vectors
+
+    @staticmethod
+    def _normalize(vectors):
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).astype(np.float32)
+
+    def add(self, items: list):
+        """
+        Append articles to the index.
+
+        Args:
+            items: List of dicts with "id", "text" and any extra metadata to keep (e.g. "url")
+        """
+        if not items:
+            return
+        vectors = self._normalize(self.embedder.embed([item["text"] for item in items]))
+        with self._locked():
+            self._refresh()
+            meta_path = os.path.join(self.path, self.META_FILE)
+            if self.dim is None and os.path.exists(meta_path):
+                with open(meta_path) as f:
+                    self.meta = json.load(f)
+            if self.dim is None:
+                self.meta["dim"] = int(vectors.shape[1])
+                with open(meta_path, "w") as f:
+                    json.dump(self.meta, f)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {self.dim}")
+
+            self._truncate_orphans()
+            with open(os.path.join(self.path, self.VECTORS_FILE), "ab") as f:
+                f.write(vectors.tobytes())
+            with open(os.path.join(self.path, self.CODES_FILE), "ab") as f:
+                f.write(self._encode(vectors).tobytes())
+            # The ID map is written last: readers never see an ID without its vector
+            with open(os.path.join(self.path, self.IDS_FILE), "a") as f:
+                f.write("".join(json.dumps({key: value for key, value in item.items() if key != "text"}) + "\n"
+                                for item in items))
+            self._refresh()
+
+    def _truncate_orphans(self):
+        """
+        Cut the files back to the rows listed in the ID map, called under the lock before appending.
+
+        A writer killed between its writes leaves vectors or codes without an ID (or half an ID
+        line); appending after them would shift every later entry onto the wrong row.
+        """
+        sizes = {
+            self.VECTORS_FILE: len(self.ids) * self.dim * np.dtype(np.float32).itemsize,
+            self.CODES_FILE: len(self.ids) * (self.CODE_BITS // 8),
+            self.IDS_FILE: self._ids_offset,
+        }
+        for name, size in sizes.items():
+            file_path = os.path.join(self.path, name)
+            if os.path.exists(file_path) and os.path.getsize(file_path) > size:
+                logging.warning(f"Dropping {os.path.getsize(file_path) - size} bytes left in {name} by an interrupted write")
+                os.truncate(file_path, size)
+
+    def _candidates(self, queries, limit):
+        """Rank rows by Hamming distance between sign-bit codes, the approximate pre-selection."""
+        query_codes = self._encode(queries)
+        candidates = []
+        for query_code in query_codes:
+            distances = np.zeros(len(self.ids), dtype=np.int32)
+            for start in range(0, len(self.ids), self.SCAN_ROWS):
+                block = np.bitwise_xor(self._codes[start:start + self.SCAN_ROWS], query_code)
+                distances[start:start + len(block)] = np.unpackbits(block, axis=1).sum(axis=1)
+            limit = min(limit, len(distances))
+            candidates.append(np.argpartition(distances, limit - 1)[:limit])
+        return candidates
+
+    def _top_k(self, scores, rows, k, exclude):
+        results = []
+        order = np.argsort(-scores)
+        for position in order:
+            row = int(rows[position])
+            page_id = self.ids[row]
+            # Skip superseded rows and excluded pages
+            if self.rows[page_id] != row or page_id in exclude:
+                continue
+            results.append((page_id, float(scores[position])))
+            if len(results) == k:
+                break
+        return results
+
+    def query(self, vectors: np.ndarray, k: int = 10, exclude: set = None, approximate: bool = None,
+              exclude_each: list = None) -> list:
+        """
+        Batched top-k cosine search.
+
+        Args:
+            vectors: Query embeddings, one per row
+            k: Number of results per query
+            exclude: Page IDs to leave out of every query's results
+            approximate: Force or disable the sign-bit pre-selection, defaults to the index size
+            exclude_each: Optional list with one set of page IDs per query, left out of that query's results only
+
+        Returns:
+            One list of (page_id, score) tuples per query
+        """
+        exclude = exclude or set()
+        matrix = self._map()
+        if matrix is None:
+            return [[] for _ in range(len(vectors))]
+        queries = self._normalize(np.atleast_2d(np.asarray(vectors, dtype=np.float32)))
+        if approximate is None:
+            approximate = len(self.ids) >= self.APPROXIMATE_MIN_ROWS
+        excludes = [exclude | (exclude_each[i] if exclude_each else set()) for i in range(len(queries))]
+        # Over-fetch to make room for superseded rows and excluded pages
+        wanted = k + max(map(len, excludes)) + (len(self.ids) - len(self.rows))
+
+        if approximate:
+            results = []
+            candidates = self._candidates(queries, wanted * self.CANDIDATES_PER_RESULT)
+            for query, rows, query_exclude in zip(queries, candidates, excludes):
+                rows = np.sort(rows)
+                results.append(self._top_k(matrix[rows] @ query, rows, k, query_exclude))
+            return results
+
+        scores = np.empty((len(queries), len(self.ids)), dtype=np.float32)
+        for start in range(0, len(self.ids), self.SCAN_ROWS):
+            block = matrix[start:start + self.SCAN_ROWS]
+            scores[:, start:start + len(block)] = queries @ block.T
+        results = []
+        all_rows = np.arange(len(self.ids))
+        for query_scores, query_exclude in zip(scores, excludes):
+            limit = min(wanted, len(query_scores))
+            rows = np.argpartition(-query_scores, limit - 1)[:limit]
+            results.append(self._top_k(query_scores[rows], all_rows[rows], k, query_exclude))
+        return results
+
+    def search(self, texts: list, k: int = 10) -> list:
+        return self.query(self.embedder.embed(texts), k)
+
+    def related(self, page_ids: list, k: int = 10) -> list:
+        """Return the k nearest articles for each indexed page ID (empty list for unknown IDs)."""
+        matrix = self._map()
+        known = [page_id for page_id in page_ids if page_id in self.rows]
+        results = dict.fromkeys(page_ids, [])
+        if known:
+            vectors = np.asarray(matrix[[self.rows[page_id] for page_id in known]])
+            # Each page is left out of its own results only, the others may well be related to it
+            neighbours_list = self.query(vectors, k, exclude_each=[{page_id} for page_id in known])
+            for page_id, neighbours in zip(known, neighbours_list):
+                results[page_id] = neighbours
+        return [results[page_id] for page_id in page_ids]
+
+
+def main(argv=None):
+    # -k is shared by the subcommands so it can follow them ("related <id> -k 10")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("-k", type=int, default=10, help="number of results")
+    parser = argparse.ArgumentParser(description="Find related articles in the local vector index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    related_parser = subparsers.add_parser("related", parents=[common], help="articles related to indexed Notion pages")
+    related_parser.add_argument("page_ids", nargs="+")
+    search_parser = subparsers.add_parser("search", parents=[common], help="articles related to a free text query")
+    search_parser.add_argument("text")
+    args = parser.parse_args(argv)
+
+    index = VectorIndex()
+    if args.command == "related":
+        results = index.related(args.page_ids, args.k)
+        labels = args.page_ids
+    else:
+        results = index.search([args.text], args.k)
+        labels = [args.text]
+
+    for label, neighbours in zip(labels, results):
+        print(label)
+        for page_id, score in neighbours:
+            print(f"  {score:.3f}  {page_id}  {index.metadata[page_id].get('url') or ''}")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    sys.exit(main())
@@ -0,0 +1,312 @@
+import os
+import json
+import time
+import signal
+import socket
+import sqlite3
+import logging
+import threading
+import multiprocessing
+from dotenv import load_dotenv
+from litequeue import LiteQueue, MessageStatus
+
+# Multi-process mode: one elected poller fills the LiteQueue from Notion while N
+# consumer processes drain it, all sharing the same SQLite file, and a supervisor
+# restarts any process that dies.
+
+load_dotenv()
+# Seconds a connection waits on a locked database before raising "database is locked"
+SQLITE_BUSY_TIMEOUT = float(os.getenv('SQLITE_BUSY_TIMEOUT', '30'))
+# A task that failed or lost its worker this many times is marked failed instead of requeued
+TASK_MAX_ATTEMPTS = int(os.getenv('TASK_MAX_ATTEMPTS', '3'))
+
+
+def open_queue(path: str) -> LiteQueue:
+    """Open the LiteQueue (WAL mode) with a busy timeout so concurrent processes wait for locks instead of failing."""
+    return LiteQueue(path, timeout=SQLITE_BUSY_TIMEOUT)
+
+
+def retry_task(queue: LiteQueue, message_id: str, data: str, error) -> bool:
+    """
+    Requeue a task with its attempt count bumped, or mark it failed after TASK_MAX_ATTEMPTS.
+
+    Tasks that are no longer LOCKED (already done or marked failed by the processor) are left alone.
+
+    Returns:
+        True if the task was requeued
+    """
+    message = queue.get(message_id)
+    if message is None or message.status != MessageStatus.LOCKED:
+        return False
+    payload = json.loads(data)
+    attempts = payload.get("attempts", 0) + 1
+    if attempts >= TASK_MAX_ATTEMPTS:
+        logging.error(f"Task {message_id} (page {payload.get('id')}) failed {attempts} times, giving up: {error}")
+        queue.mark_failed(message_id)
+        return False
+    payload["attempts"] = attempts
+    logging.warning(f"Task {message_id} (page {payload.get('id')}) failed ({error}), "
+                    f"requeueing for attempt {attempts + 1}/{TASK_MAX_ATTEMPTS}")
+    with queue.transaction(mode="IMMEDIATE"):
+        queue.put(json.dumps(payload))
+        queue.done(message_id)
+    return True
+
+
+class TaskHeartbeat:
+    """Marks a task as still being worked on, so the poller does not requeue a slow but live task."""
+
+    def __init__(self, db_path: str, message_id: str, interval: float = None):
+        """
+        Initialize TaskHeartbeat.
+
+        Args:
+            db_path: SQLite file of the queue (LITEQUEUE_DB)
+            message_id: ID of the task being processed
+            interval: Seconds between beats (TASK_HEARTBEAT_INTERVAL)
+        """
+        self.db_path = db_path
+        self.message_id = message_id
+        self.interval = interval or self.default_interval()
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def default_interval() -> float:
+        return float(os.getenv('TASK_HEARTBEAT_INTERVAL', '30'))
+
+    @staticmethod
+    def _connect(db_path):
+        conn = sqlite3.connect(db_path, timeout=SQLITE_BUSY_TIMEOUT, isolation_level=None)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS task_heartbeat (
+                message_id TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                beat_at REAL NOT NULL
+            )
+        """)
+        return conn
+
+    def _beat(self, conn):
+        conn.execute(
+            "INSERT INTO task_heartbeat (message_id, owner, beat_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(message_id) DO UPDATE SET owner = excluded.owner, beat_at = excluded.beat_at",
+            (self.message_id, self.owner, time.time())
+        )
+
+    def _run(self):
+        conn = self._connect(self.db_path)
+        try:
+            while not self._stop.wait(self.interval):
+                try:
+                    self._beat(conn)
+                except sqlite3.Error as e:
+                    logging.warning(f"Heartbeat for task {self.message_id} failed: {e}")
+            conn.execute("DELETE FROM task_heartbeat WHERE message_id = ?", (self.message_id,))
+        finally:
+            conn.close()
+
+    def __enter__(self):
+        # First beat before returning, so the task is never seen locked without one
+        conn = self._connect(self.db_path)
+        try:
+            self._beat(conn)
+        finally:
+            conn.close()
+        self._thread = threading.Thread(target=self._run, name=f"heartbeat-{self.message_id}", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    @classmethod
+    def alive(cls, db_path: str, timeout: float = None) -> set:
+        """IDs of the tasks whose worker beat within timeout seconds (three intervals by default)."""
+        timeout = timeout or cls.default_interval() * 3
+        conn = cls._connect(db_path)
+        try:
+            rows = conn.execute("SELECT message_id FROM task_heartbeat WHERE beat_at >= ?",
+                                (time.time() - timeout,)).fetchall()
+            # Rows left behind by killed workers
+            conn.execute("DELETE FROM task_heartbeat WHERE beat_at < ?", (time.time() - 86400,))
+        finally:
+            conn.close()
+        return {row[0] for row in rows}
+
+
+class LeaderLease:
+    """A renewable lease stored in SQLite; only the process holding it polls Notion."""
+
+    def __init__(self, db_path: str, name: str = "poller", ttl: float = None):
+        """
+        Initialize LeaderLease.
+
+        Args:
+            db_path: SQLite file shared by every candidate (usually LITEQUEUE_DB)
+            name: Lease name, one leader per name
+            ttl: Seconds before an unrenewed lease can be taken over (LEADER_LEASE_TTL)
+        """
+        self.db_path = db_path
+        self.name = name
+        self.ttl = ttl or float(os.getenv('LEADER_LEASE_TTL', '60'))
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._leader = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=SQLITE_BUSY_TIMEOUT, isolation_level=None)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS leader_lease (
+                name TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        return conn
+
+    def acquire(self, conn) -> bool:
+        """Take or renew the lease if it is free, expired or already ours."""
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT owner, expires_at FROM leader_lease WHERE name = ?", (self.name,)).fetchone()
+            held = row is None or row[1] < now or row[0] == self.owner
+            if held:
+                conn.execute(
+                    "INSERT INTO leader_lease (name, owner, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at",
+                    (self.name, self.owner, now + self.ttl)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return held
+
+    def release(self, conn):
+        conn.execute("DELETE FROM leader_lease WHERE name = ? AND owner = ?", (self.name, self.owner))
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leader.is_set()
+
+    def _run(self):
+        conn = self._connect()
+        try:
+            while not self._stop.is_set():
+                try:
+                    held = self.acquire(conn)
+                except sqlite3.Error as e:
+                    logging.warning(f"Leader lease renewal failed: {e}")
+                    held = False
+                if held and not self.is_leader:
+                    logging.info(f"Leader lease '{self.name}' acquired by {self.owner}")
+                elif not held and self.is_leader:
+                    logging.warning(f"Leader lease '{self.name}' lost by {self.owner}")
+                if held:
+                    self._leader.set()
+                else:
+                    self._leader.clear()
+                # Renew well before expiry so a slow poll never lets the lease lapse
+                self._stop.wait(self.ttl / 3)
+            if self.is_leader:
+                self.release(conn)
+                self._leader.clear()
+        finally:
+            conn.close()
+
+    def start(self):
+        """Keep acquiring/renewing the lease from a background thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"lease-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def _run_worker(target):
+    # Forked children inherit the supervisor's SIGTERM handler, restore the default so terminate() stops them
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    if hasattr(signal, 'SIGUSR1'):
+        # Ignored until the worker installs its own handler (consumers toggle task profiling)
+        signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+    target()
+
+
+class Supervisor:
+    """Runs named worker processes and restarts the ones that exit, backing off when they keep crashing."""
+
+    def __init__(self, targets: dict, restart_delay: float = None, max_restart_delay: float = 300):
+        """
+        Initialize Supervisor.
+
+        Args:
+            targets: Mapping of process name to a picklable, module-level callable
+            restart_delay: Initial delay before restarting a crashed process (WORKER_RESTART_DELAY)
+            max_restart_delay: Upper bound of the exponential backoff
+        """
+        self.targets = targets
+        self.restart_delay = restart_delay or float(os.getenv('WORKER_RESTART_DELAY', '5'))
+        self.max_restart_delay = max_restart_delay
+        self.processes = {}
+        self.delays = {name: self.restart_delay for name in targets}
+        self.restart_at = {}
+        self.stopping = False
+
+    def _start(self, name):
+        process = multiprocessing.Process(target=_run_worker, args=(self.targets[name],), name=name)
+        process.start()
+        self.processes[name] = (process, time.monotonic())
+        logging.info(f"Started worker {name} (pid {process.pid})")
+
+    def _stop(self, signum, frame):
+        self.stopping = True
+
+    def _forward(self, signum, frame):
+        for process, _ in self.processes.values():
+            if process.is_alive():
+                os.kill(process.pid, signum)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._stop)
+        if hasattr(signal, 'SIGUSR1'):
+            # kill -USR1 <supervisor> toggles task profiling in every worker
+            signal.signal(signal.SIGUSR1, self._forward)
+        for name in self.targets:
+            self._start(name)
+        try:
+            while not self.stopping:
+                now = time.monotonic()
+                for name, (process, started) in list(self.processes.items()):
+                    if process.is_alive():
+                        continue
+                    if name not in self.restart_at:
+                        uptime = now - started
+                        # A worker that ran for a while gets a fresh backoff, one crashing on start waits longer
+                        if uptime > self.max_restart_delay:
+                            self.delays[name] = self.restart_delay
+                        logging.error(f"Worker {name} (pid {process.pid}) exited with code {process.exitcode}, "
+                                      f"restarting in {self.delays[name]:.0f}s")
+                        self.restart_at[name] = now + self.delays[name]
+                        self.delays[name] = min(self.delays[name] * 2, self.max_restart_delay)
+                    elif now >= self.restart_at[name]:
+                        del self.restart_at[name]
+                        self._start(name)
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            logging.info("Stopping workers...")
+            for process, _ in self.processes.values():
+                if process.is_alive():
+                    process.terminate()
+            for process, _ in self.processes.values():
+                process.join()